@@ -0,0 +1,76 @@
+"""
+Measures memory allocated for Values with tracemalloc while a loop reads
+variables and passes them through a procedure, under every execution mode.
+
+    python -m benchmarks.allocations [iterations]
+
+"values kept" is what the Values the program still holds at the end take up
+(the list it built), "peak" is the most traced memory in use at once.
+"""
+
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+from interpreter import run
+
+
+PROGRAM = """
+PROCEDURE identity(value) {{
+    RETURN value
+}}
+x = 7
+name = "ada"
+out = []
+i = 0
+WHILE (i < {iterations}) {{
+    APPEND(out, x)
+    APPEND(out, identity(name))
+    i = i + 1
+}}
+DISPLAY(LENGTH(out))
+"""
+
+MODES = ("tree", "closure", "bytecode")
+
+
+def measure(source, mode):
+    """Returns (values kept in blocks, values kept in KiB, peak KiB, seconds)"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        tracemalloc.start()
+        start = time.perf_counter()
+        _, error = run("<benchmark>", source, mode=mode)
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    if error:
+        raise Exception(error.as_string())
+
+    values = snapshot.filter_traces(
+        [tracemalloc.Filter(True, "*values.py"), tracemalloc.Filter(True, "*interpreter.py")]
+    )
+    kept = values.statistics("filename")
+    blocks = sum(stat.count for stat in kept)
+    size = sum(stat.size for stat in kept)
+    return blocks, size / 1024, peak / 1024, elapsed
+
+
+def main(argv):
+    iterations = int(argv[0]) if argv else 10000
+    source = PROGRAM.format(iterations=iterations)
+
+    print(f"{iterations} iterations, {2 * iterations} values kept in a list")
+    print(f"{'mode':<10}{'values kept':>20}{'peak':>14}{'time':>10}")
+    for mode in MODES:
+        blocks, size, peak, elapsed = measure(source, mode)
+        print(
+            f"{mode:<10}{blocks:>8} blocks{size:>8.0f} KiB{peak:>10.0f} KiB{elapsed:>9.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
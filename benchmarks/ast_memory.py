@@ -0,0 +1,68 @@
+"""
+Measures the memory the tokens and the AST of a long generated program take
+up once it's parsed, and how long lexing and parsing it takes.
+
+    python -m benchmarks.ast_memory [lines]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+
+BLOCK = """\
+PROCEDURE step{n}(a, b) {{
+    total = a * {n} + b
+    IF (total > 100 AND NOT (b == 0)) {{
+        RETURN total MOD 7
+    }} ELSE {{
+        items = [a, b, "step{n}"]
+    }}
+    RETURN LENGTH(items) - b
+}}
+x{n} = step{n}(x{n} - 1, LENGTH([1, 2, 3]))
+"""
+
+
+def generate(lines):
+    """Returns a program of about lines lines"""
+    block_lines = BLOCK.count("\n")
+    return "".join(BLOCK.format(n=n) for n in range(lines // block_lines))
+
+
+def measure(text):
+    """Returns (tokens KiB, tokens and AST KiB, seconds) for lexing and parsing text"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens, error = Lexer("<benchmark>", text).make_tokens()
+    if error:
+        raise Exception(error.as_string())
+    tokens_size, _ = tracemalloc.get_traced_memory()
+    ast = Parser(tokens).parse()
+    if ast.error:
+        raise Exception(ast.error.as_string())
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    total_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tokens_size / 1024, total_size / 1024, elapsed
+
+
+def main(argv):
+    lines = int(argv[0]) if argv else 50000
+    text = generate(lines)
+
+    tokens_size, total_size, elapsed = measure(text)
+    print(f"{text.count(chr(10))} lines, {len(text) / 1024:.0f} KiB of source")
+    print(f"tokens          {tokens_size:>10.0f} KiB")
+    print(f"tokens and AST  {total_size:>10.0f} KiB")
+    print(f"lex and parse   {elapsed:>10.3f}s (traced)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,97 @@
+"""
+Times builtin and procedure calls in a loop with and without the call site
+inline caches, under every execution mode. The loop runs at the top level and
+again inside a procedure 50 calls deep, where looking a name up walks every
+caller's frame first.
+
+    python -m benchmarks.calls [iterations]
+"""
+
+import contextlib
+import gc
+import io
+import sys
+import time
+
+import compiler.resolver
+from interpreter import run
+
+
+LOOP = """
+i = 0
+total = 0
+WHILE (i < {iterations}) {{
+    total = total + LENGTH(items) + twice(i)
+    i = i + 1
+}}
+"""
+
+PROGRAMS = {
+    "top level": """
+PROCEDURE twice(n) {{
+    RETURN n * 2
+}}
+items = [1, 2, 3]
+{loop}
+DISPLAY(total)
+""",
+    "50 calls deep": """
+PROCEDURE twice(n) {{
+    RETURN n * 2
+}}
+PROCEDURE nest(depth) {{
+    IF (depth == 0) {{
+        {loop}
+        RETURN total
+    }} ELSE {{
+        result = nest(depth - 1)
+        RETURN result
+    }}
+}}
+items = [1, 2, 3]
+DISPLAY(nest(50))
+""",
+}
+
+MODES = ("tree", "closure", "bytecode", "stackless")
+
+
+def time_run(source, mode, repeat=3):
+    """Returns the best time out of repeat runs and what the program printed"""
+    best = None
+    for _ in range(repeat):
+        output = io.StringIO()
+        gc.collect()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            _, error = run("<benchmark>", source, mode=mode)
+            elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue().strip()
+
+
+def main(argv):
+    iterations = int(argv[0]) if argv else 20000
+    loop = LOOP.format(iterations=iterations)
+
+    print(f"{iterations} iterations, 2 calls each")
+    for name, program in PROGRAMS.items():
+        source = program.format(loop=loop)
+        print(name)
+        print(f"    {'mode':<10}{'uncached':>10}{'cached':>10}{'speedup':>10}")
+        for mode in MODES:
+            compiler.resolver.CACHE_CALLEES = False
+            uncached, expected = time_run(source, mode)
+            compiler.resolver.CACHE_CALLEES = True
+            cached, output = time_run(source, mode)
+            if output != expected:
+                raise Exception(f"{mode} printed {output}, expected {expected}")
+            print(
+                f"    {mode:<10}{uncached:>9.3f}s{cached:>9.3f}s{uncached / cached:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+"""
+Times a comparison heavy WHILE loop with and without the Number x Number
+operator fast paths, under every execution mode. The tree is resolved without
+them, with Resolver(specialize_numbers=False), for the plain method dispatch.
+
+    python -m benchmarks.comparisons [iterations]
+"""
+
+import contextlib
+import gc
+import io
+import sys
+import time
+
+from compiler.resolver import Resolver
+from compiler.tree_cache import parse_program
+from interpreter import Session
+
+
+PROGRAM = """
+i = 0
+hits = 0
+WHILE (i < {iterations}) {{
+    IF (i MOD 3 == 0 OR i MOD 5 == 0) {{
+        hits = hits + 1
+    }} ELIF (i >= 10 AND i <= 20) {{
+        hits = hits + 2
+    }} ELSE {{
+        hits = hits - 0
+    }}
+    i = i + 1
+}}
+DISPLAY(hits)
+"""
+
+MODES = ("tree", "closure", "bytecode")
+
+
+def time_run(source, mode, specialize_numbers, repeat=5):
+    """Returns the best time out of repeat runs and what the program printed"""
+    best = None
+    for _ in range(repeat):
+        session = Session()
+        node, error = parse_program("<benchmark>", source)
+        if error:
+            raise Exception(error.as_string())
+        Resolver(session.procedure_names, specialize_numbers).resolve(node)
+
+        output = io.StringIO()
+        gc.collect()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            _, error = session.execute(node, mode)
+        elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue().strip()
+
+
+def main(argv):
+    iterations = int(argv[0]) if argv else 20000
+    source = PROGRAM.format(iterations=iterations)
+
+    print(f"{iterations} iterations")
+    print(f"{'mode':<10}{'methods':>10}{'fast path':>12}{'speedup':>10}")
+    for mode in MODES:
+        generic, expected = time_run(source, mode, specialize_numbers=False)
+        specialized, output = time_run(source, mode, specialize_numbers=True)
+        if output != expected:
+            raise Exception(f"{mode} printed {output}, expected {expected}")
+        print(
+            f"{mode:<10}{generic:>9.3f}s{specialized:>11.3f}s{generic / specialized:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
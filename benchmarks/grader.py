@@ -0,0 +1,86 @@
+"""
+Times grading a directory of generated programs one at a time in this process,
+like calling run() per file, and with grader.py's process pool at 1 worker up to
+one per core, in programs per second.
+
+    python -m benchmarks.grader [programs]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import grader
+
+
+PROGRAM = """\
+name = INPUT()
+PROCEDURE fib(n)
+{{
+    IF (n < 2) {{ RETURN n }} ELSE {{ RETURN fib(n - 1) + fib(n - 2) }}
+}}
+total = 0
+items = [1, 2, 3, {n}]
+FOR EACH x IN items
+{{
+    total = total + fib(x + 8)
+}}
+DISPLAY(name)
+DISPLAY(total)
+"""
+
+
+def write_programs(directory, count):
+    for n in range(count):
+        with open(os.path.join(directory, f"student{n}.txt"), "w") as f:
+            f.write(PROGRAM.format(n=n % 5))
+        with open(os.path.join(directory, f"student{n}.in"), "w") as f:
+            f.write(f"student{n}\n")
+
+
+def without_times(results):
+    """The results of grader.grade without how long each program took"""
+    results = [json.loads(result) for result in results]
+    for result in results:
+        del result["seconds"]
+    return results
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 200
+    cores = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_programs(directory, count)
+        jobs = grader.find_programs(directory)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = [grader.grade(job) for job in jobs]
+        for result in without_times(expected):
+            if result["error"]:
+                raise Exception(result["error"])
+        sequential = count / (time.perf_counter() - start)
+
+        print(f"{count} programs, {cores} cores")
+        print(f"{'workers':<12}{'programs/s':>12}{'speedup':>10}")
+        print(f"{'in process':<12}{sequential:>12.1f}{1:>9.1f}x")
+        workers = 1
+        while True:
+            start = time.perf_counter()
+            results = list(grader.grade_all(jobs, workers=workers))
+            throughput = count / (time.perf_counter() - start)
+            if without_times(results) != without_times(expected):
+                raise Exception(f"Results with {workers} workers differ")
+            print(f"{workers:<12}{throughput:>12.1f}{throughput / sequential:>9.1f}x")
+            if workers >= cores:
+                break
+            workers = min(workers * 2, cores)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
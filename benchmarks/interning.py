@@ -0,0 +1,80 @@
+"""
+Counts the Numbers and Booleans made while the comparisons and loop_memory
+loops run, under every execution mode. Before, Number.of and Boolean.of make a
+new value every time. After, Number.of shares the small integers and Boolean.of
+shares TRUE and FALSE.
+
+    python -m benchmarks.interning [iterations]
+"""
+
+import contextlib
+import io
+import sys
+
+import benchmarks.comparisons
+import benchmarks.loop_memory
+from interpreter import run
+from values import Number, Boolean, intern_small_ints, share_booleans
+
+
+PROGRAMS = {
+    "comparisons": benchmarks.comparisons.PROGRAM,
+    "loop_memory": benchmarks.loop_memory.PROGRAM,
+}
+
+MODES = ("tree", "closure", "bytecode")
+
+
+@contextlib.contextmanager
+def counting_values():
+    """Counts Number and Boolean objects made in the block, by class name"""
+    counts = {"Number": 0, "Boolean": 0}
+    inits = {}
+    for cls in (Number, Boolean):
+        inits[cls] = cls.__init__
+
+        def __init__(self, value, cls=cls):
+            counts[cls.__name__] += 1
+            inits[cls](self, value)
+
+        cls.__init__ = __init__
+    try:
+        yield counts
+    finally:
+        for cls, init in inits.items():
+            cls.__init__ = init
+
+
+def count_values(source, mode):
+    """Returns the Numbers and Booleans made while running source"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        with counting_values() as counts:
+            _, error = run("<benchmark>", source, mode=mode)
+    if error:
+        raise Exception(error.as_string())
+    return counts["Number"], counts["Boolean"]
+
+
+def main(argv):
+    iterations = int(argv[0]) if argv else 10000
+
+    print(f"{iterations} iterations, Numbers / Booleans made")
+    for name, program in PROGRAMS.items():
+        source = program.format(iterations=iterations)
+        print(name)
+        print(f"    {'mode':<10}{'before':>22}{'after':>22}")
+        for mode in MODES:
+            intern_small_ints(0, -1)
+            share_booleans(False)
+            unshared = count_values(source, mode)
+            intern_small_ints()
+            share_booleans()
+            shared = count_values(source, mode)
+            print(
+                f"    {mode:<10}{unshared[0]:>12} / {unshared[1]:<7}{shared[0]:>12} / {shared[1]:<7}"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+"""
+Measures lexing throughput in MB/s of Lexer and RegexLexer on generated
+programs of growing size, checking both make the same tokens.
+
+    python -m benchmarks.lexer [lines ...]
+"""
+
+import gc
+import sys
+import time
+
+from benchmarks.ast_memory import generate
+from compiler.differential import lex
+from lexer.lexer import Lexer
+from lexer.regex_lexer import RegexLexer
+
+
+LEXERS = (Lexer, RegexLexer)
+
+
+def throughput(lexer_class, text, repeat=3):
+    """Returns the best MB/s out of repeat runs"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        _, error = lexer_class("<benchmark>", text).make_tokens()
+        elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return len(text.encode()) / best / 1e6
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 10000, 50000]
+
+    print(f"{'lines':<10}{'MB':>8}" + "".join(f"{cls.__name__:>14}" for cls in LEXERS))
+    for lines in sizes:
+        text = generate(lines)
+        if lex(Lexer, text) != lex(RegexLexer, text):
+            raise Exception(f"RegexLexer tokens differ from Lexer at {lines} lines")
+        row = f"{lines:<10}{len(text.encode()) / 1e6:>8.2f}"
+        for lexer_class in LEXERS:
+            row += f"{throughput(lexer_class, text):>9.2f} MB/s"
+        print(row)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+"""
+Times building a long list with list = list + x and with APPEND, under every
+execution mode.
+
+    python -m benchmarks.lists [length]
+"""
+
+import contextlib
+import gc
+import io
+import sys
+import time
+
+from interpreter import run
+
+
+PROGRAMS = {
+    "l = l + i": """
+l = []
+i = 0
+WHILE (i < {length}) {{
+    l = l + i
+    i = i + 1
+}}
+DISPLAY(LENGTH(l))
+""",
+    "APPEND(l, i)": """
+l = []
+i = 0
+WHILE (i < {length}) {{
+    APPEND(l, i)
+    i = i + 1
+}}
+DISPLAY(LENGTH(l))
+""",
+}
+
+MODES = ("tree", "closure", "bytecode")
+
+
+def time_run(source, mode, repeat=3):
+    """Returns the best time out of repeat runs and what the program printed"""
+    best = None
+    for _ in range(repeat):
+        output = io.StringIO()
+        gc.collect()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            _, error = run("<benchmark>", source, mode=mode)
+            elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue().strip()
+
+
+def main(argv):
+    length = int(argv[0]) if argv else 100000
+
+    print(f"lists of {length} elements")
+    print(f"{'mode':<10}" + "".join(f"{name:>16}" for name in PROGRAMS))
+    for mode in MODES:
+        row = f"{mode:<10}"
+        for program in PROGRAMS.values():
+            elapsed, output = time_run(program.format(length=length), mode)
+            if output != str(length):
+                raise Exception(f"{mode} printed {output}, expected {length}")
+            row += f"{elapsed:>15.3f}s"
+        print(row)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,40 @@
+"""
+Measures peak memory of a REPEAT loop used as a statement at growing
+iteration counts, under every execution mode. The peak should stay flat,
+since nothing keeps the values of past iterations.
+
+    python -m benchmarks.loop_memory [iterations ...]
+"""
+
+import sys
+
+from benchmarks.allocations import MODES, measure
+
+
+PROGRAM = """
+total = 0
+REPEAT {iterations} TIMES {{
+    total = total + 1
+    name = "ada"
+}}
+DISPLAY(total)
+"""
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or [10000, 100000, 1000000]
+    # Imports and caches filled by a mode's first run would count towards the first peak
+    for mode in MODES:
+        measure(PROGRAM.format(iterations=1), mode)
+
+    print(f"{'iterations':<12}" + "".join(f"{mode + ' peak':>18}" for mode in MODES))
+    for iterations in counts:
+        row = f"{iterations:<12}"
+        for mode in MODES:
+            _, _, peak, _ = measure(PROGRAM.format(iterations=iterations), mode)
+            row += f"{peak:>14.0f} KiB"
+        print(row)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
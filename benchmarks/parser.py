@@ -0,0 +1,52 @@
+"""
+Times parsing generated programs of growing length, to check the time per
+line stays flat.
+
+    python -m benchmarks.parser [lines ...]
+"""
+
+import gc
+import sys
+import time
+
+from benchmarks.ast_memory import generate
+from lexer.regex_lexer import RegexLexer
+from parser.parser import Parser
+
+
+def parse_time(text, repeat=3):
+    """
+    Returns the best time to parse text, not counting lexing it. The garbage
+    collector is off while timing, as timeit does, since its passes over every
+    live object would otherwise grow with the size of the program.
+    """
+    best = None
+    for _ in range(repeat):
+        tokens, error = RegexLexer("<benchmark>", text).make_tokens()
+        if error:
+            raise Exception(error.as_string())
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            ast = Parser(tokens).parse()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if ast.error:
+            raise Exception(ast.error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 10000, 100000]
+    print(f"{'lines':<10}{'parse':>10}{'per line':>14}")
+    for lines in sizes:
+        text = generate(lines)
+        elapsed = parse_time(text, repeat=3 if lines <= 10000 else 1)
+        line_count = text.count("\n")
+        print(f"{line_count:<10}{elapsed:>9.3f}s{elapsed / line_count * 1e6:>11.1f} us")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+"""
+Times recursive procedures, fib(25) and Ackermann(2, 25) computed 100 times,
+under every execution mode and reports procedure calls per second.
+
+    python -m benchmarks.recursion [fib n] [ackermann n]
+"""
+
+import contextlib
+import gc
+import io
+import sys
+import time
+
+from interpreter import run
+
+
+FIB = """
+PROCEDURE fib(n) {{
+    IF (n < 2) {{
+        RETURN n
+    }} ELSE {{
+        RETURN fib(n - 1) + fib(n - 2)
+    }}
+}}
+DISPLAY(fib({n}))
+"""
+
+ACKERMANN = """
+PROCEDURE ackermann(m, n) {{
+    IF (m == 0) {{
+        RETURN n + 1
+    }} ELIF (n == 0) {{
+        RETURN ackermann(m - 1, 1)
+    }} ELSE {{
+        RETURN ackermann(m - 1, ackermann(m, n - 1))
+    }}
+}}
+REPEAT {repeat} TIMES {{
+    result = ackermann(2, {n})
+}}
+DISPLAY(result)
+"""
+
+MODES = ("tree", "closure", "bytecode", "stackless")
+
+
+def fib_calls(n):
+    """Returns (fib(n), how many calls computing it recursively makes)"""
+    a, b = 0, 1
+    calls = [1, 1]
+    for i in range(2, n + 1):
+        a, b = b, a + b
+        calls.append(calls[i - 1] + calls[i - 2] + 1)
+    return (a if n == 0 else b), calls[n]
+
+
+def ackermann_calls(m, n):
+    """Returns (ackermann(m, n), how many calls computing it recursively makes)"""
+    calls = 0
+    stack = [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            n = 1
+            stack.append(m - 1)
+        else:
+            n -= 1
+            stack.append(m - 1)
+            stack.append(m)
+    return n, calls
+
+
+def time_run(source, mode, repeat=3):
+    """Returns the best time out of repeat runs and what the program printed"""
+    best = None
+    for _ in range(repeat):
+        output = io.StringIO()
+        gc.collect()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            _, error = run("<benchmark>", source, mode=mode)
+            elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue().strip()
+
+
+def main(argv):
+    fib_n = int(argv[0]) if argv else 25
+    ackermann_n = int(argv[1]) if len(argv) > 1 else 25
+    # Ackermann(2, n) makes few calls for how deep it recurses, so it's computed repeatedly
+    repeat = 100
+    result, calls = ackermann_calls(2, ackermann_n)
+    benchmarks = [
+        (f"fib({fib_n})", FIB.format(n=fib_n), fib_calls(fib_n)),
+        (
+            f"ackermann(2, {ackermann_n}) x {repeat}",
+            ACKERMANN.format(n=ackermann_n, repeat=repeat),
+            (result, calls * repeat),
+        ),
+    ]
+
+    for name, source, (expected, calls) in benchmarks:
+        print(f"{name}: {calls} calls")
+        for mode in MODES:
+            elapsed, output = time_run(source, mode)
+            if output != str(expected):
+                raise Exception(f"{mode} printed {output}, expected {expected}")
+            print(f"    {mode:<10}{elapsed:>8.3f}s{calls / elapsed:>12.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+"""
+Times RUN on a generated library of procedures when its tree is parsed every
+time (cold), loaded from its cache directory (warm disk, like a new process)
+and reused from memory (warm memory). The tree column times getting the tree
+alone, without resolving and running it.
+
+    python -m benchmarks.run_cache [lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from compiler import tree_cache
+from interpreter import run
+
+
+BLOCK = """\
+PROCEDURE step{n}(a, b)
+{{
+    total = a * {n} + b
+    IF (total > 100 AND NOT (b == 0))
+    {{
+        RETURN total MOD 7
+    }}
+    ELSE
+    {{
+        items = [a, b, "step{n}"]
+    }}
+    RETURN LENGTH(items) - b
+}}
+"""
+
+
+def generate(lines):
+    """Returns a library of procedures about lines lines long"""
+    block_lines = BLOCK.count("\n")
+    return "".join(BLOCK.format(n=n) for n in range(max(1, lines // block_lines)))
+
+
+def best_time(function, before_each, repeat):
+    """Returns the best time of calling function, calling before_each first"""
+    best = None
+    for _ in range(repeat):
+        before_each()
+        start = time.perf_counter()
+        _, error = function()
+        elapsed = time.perf_counter() - start
+        if error:
+            raise Exception(error.as_string())
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    lines = int(argv[0]) if argv else 1000
+    repeat = 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.txt")
+        with open(path, "w") as f:
+            f.write(generate(lines))
+        with open(path, "r") as f:
+            text = f.read()
+        program = f'RUN("{path}")'
+
+        def run_program():
+            return run("<benchmark>", program)
+
+        def get_tree():
+            return tree_cache.cached_program(path, text)
+
+        def parse_every_time():
+            tree_cache.USE_DISK_CACHE = False
+            tree_cache.memo.clear()
+
+        def load_from_disk():
+            tree_cache.USE_DISK_CACHE = True
+            tree_cache.memo.clear()
+
+        def reuse_from_memory():
+            pass
+
+        times = {}
+        for name, before_each in (
+            ("cold", parse_every_time),
+            ("warm disk", load_from_disk),
+            ("warm memory", reuse_from_memory),
+        ):
+            if name == "warm disk":
+                load_from_disk()
+                run_program()  # writes the cache file
+            times[name] = (
+                best_time(run_program, before_each, repeat),
+                best_time(get_tree, before_each, repeat),
+            )
+
+    print(f"RUN of a {lines} line library, best of {repeat}")
+    print(f"{'':<14}{'RUN':>10}{'speedup':>9}{'tree':>11}{'speedup':>9}")
+    cold_run, cold_tree = times["cold"]
+    for name, (run_time, tree_time) in times.items():
+        print(
+            f"{name:<14}{run_time * 1000:>8.2f}ms{cold_run / run_time:>8.1f}x"
+            f"{tree_time * 1000:>9.2f}ms{cold_tree / tree_time:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
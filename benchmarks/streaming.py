@@ -0,0 +1,62 @@
+"""
+Compares parsing a long generated program from a full token list with parsing
+it from RegexLexer.generate_tokens(): how soon the parser has its first token,
+the time to parse everything and the most memory held on the way.
+
+    python -m benchmarks.streaming [lines]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmarks.ast_memory import generate
+from lexer.regex_lexer import RegexLexer
+from parser.parser import Parser
+
+
+def from_list(text):
+    tokens, error = RegexLexer("<benchmark>", text).make_tokens()
+    if error:
+        raise Exception(error.as_string())
+    return Parser(tokens)
+
+
+def from_stream(text):
+    return Parser(RegexLexer("<benchmark>", text).generate_tokens())
+
+
+def measure(make_parser, text):
+    """Returns (seconds to the first token, seconds in all, peak KiB, AST KiB)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    parser = make_parser(text)
+    first_token = time.perf_counter() - start
+    ast = parser.parse()
+    elapsed = time.perf_counter() - start
+    if ast.error:
+        raise Exception(ast.error.as_string())
+    del parser
+    gc.collect()
+    ast_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_token, elapsed, peak_size / 1024, ast_size / 1024
+
+
+def main(argv):
+    lines = int(argv[0]) if argv else 50000
+    text = generate(lines)
+    print(f"{text.count(chr(10))} lines, {len(text) / 1024:.0f} KiB of source")
+    print(f"{'':<12}{'first token':>14}{'parse':>10}{'peak':>14}{'AST':>14}")
+    for name, make_parser in (("list", from_list), ("stream", from_stream)):
+        first_token, elapsed, peak_size, ast_size = measure(make_parser, text)
+        print(
+            f"{name:<12}{first_token * 1000:>12.2f}ms{elapsed:>9.2f}s"
+            f"{peak_size:>10.0f} KiB{ast_size:>10.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,387 @@
+from values import *
+from lexer.tokens import *
+from parser.nodes import *
+
+
+# Opcodes, roughly ordered by how often the VM sees them
+LOAD_NAME = 0  # (name, pos_start, pos_end)
+LOAD_CONST = 1  # Value
+BINARY_OP = 2  # (operator handler, Number x Number operation or None, left node, right node)
+STORE_NAME = 3  # name
+POP_JUMP_IF_FALSE = 4  # target
+POP_JUMP_IF_TRUE = 5  # target
+JUMP = 6  # target
+FOR_ITER = 7  # target to jump to once the iterator is exhausted
+POP_TOP = 8
+DUP_TOP = 9
+CALL = 10  # (arg count, pos_start, pos_end, enclosing loop or None)
+LOAD_NULL = 11
+UNARY_OP = 12  # (operator handler, operand node)
+BUILD_LIST = 13  # element count
+GET_ITER = 14  # (pos_start, pos_end) of the iterated expression
+GET_REPEAT_ITER = 15  # constant count, or None to pop the count off the stack
+JUMP_CLEAR = 16  # (target, stack depth), used by BREAK and CONTINUE
+NEW_ACCUMULATOR = 17
+ACCUMULATE = 18  # stack depth of the accumulator
+BUILD_ACCUMULATED = 19
+MAKE_FUNCTION = 20  # (name, code, arg names, should auto return, body node, slot index)
+RETURN_VALUE = 21
+BREAK_OUT = 22
+CONTINUE_OUT = 23
+RETURN_RESULT = 24
+LOAD_SLOT = 25  # (index, name, pos_start, pos_end)
+STORE_SLOT = 26  # index
+SHORT_CIRCUIT = 27  # (target, deciding Boolean value)
+TAIL_CALL = 28  # (arg count, pos_start, pos_end, the Resolver's tail_call), a CALL in RETURN f(...)
+LOAD_CALLEE = 29  # (CalleeCache, name, pos_start, pos_end of the name, pos_start, pos_end of the call)
+STEP = 30  # (pos_start, pos_end) of the loop's header, counts a run of a loop body
+
+OPCODE_NAMES = {
+    value: name
+    for name, value in dict(globals()).items()
+    if name.isupper() and isinstance(value, int) and not name.startswith("TYPE_")
+}
+
+
+class Label:
+    def __init__(self):
+        self.target = None
+
+
+class Loop:
+    """Where BREAK and CONTINUE inside a loop body should jump to"""
+
+    def __init__(self, break_label, continue_label, depth):
+        self.break_label = break_label
+        self.continue_label = continue_label
+        self.depth = depth
+
+
+class Code:
+    def __init__(self, name, instructions):
+        self.name = name
+        self.instructions = instructions
+
+    def disassemble(self):
+        lines = []
+        for i, (op, arg) in enumerate(self.instructions):
+            lines.append(f"{i:>4} {OPCODE_NAMES[op]:<18} {'' if arg is None else arg}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+
+class BytecodeCompiler:
+    """
+    Compiles the AST into a flat list of (opcode, argument) pairs for the
+    VirtualMachine. The compiler tracks the stack depth so BREAK and CONTINUE
+    can drop whatever a half evaluated expression left on the stack.
+    """
+
+    def __init__(self, name="<program>"):
+        self.name = name
+        self.instructions = []
+        self.depth = 0
+        self.loops: list[Loop] = []
+
+    def compile_program(self, node):
+        """Compiles a tree whose value is kept, such as the top level of a program"""
+        self.compile(node, keep=True)
+        self.emit(RETURN_RESULT, stack_effect=-1)
+        return self.assemble()
+
+    def compile_function_body(self, node, should_auto_return):
+        self.compile(node, keep=should_auto_return)
+        if not should_auto_return:
+            self.emit(LOAD_NULL, stack_effect=1)
+        self.emit(RETURN_RESULT, stack_effect=-1)
+        return self.assemble()
+
+    def assemble(self):
+        instructions = []
+        for op, arg in self.instructions:
+            instructions.append((op, self.resolve(arg)))
+        return Code(self.name, instructions)
+
+    def resolve(self, arg):
+        if isinstance(arg, Label):
+            return arg.target
+        if isinstance(arg, Loop):
+            return (arg.break_label.target, arg.continue_label.target, arg.depth)
+        if isinstance(arg, tuple):
+            return tuple(self.resolve(item) for item in arg)
+        return arg
+
+    def emit(self, op, arg=None, stack_effect=0):
+        self.instructions.append((op, arg))
+        self.depth += stack_effect
+
+    def mark(self, label: Label):
+        label.target = len(self.instructions)
+
+    def compile(self, node, keep):
+        """Emits code for node. If keep is set, the node's value is left on the stack."""
+        method_name = f"compile_{type(node).__name__}"
+        method = getattr(self, method_name, self.no_compile_method)
+        method(node, keep)
+
+    def no_compile_method(self, node, keep):
+        raise Exception(f"No compile_{type(node).__name__}")
+
+    def discard(self, keep):
+        if not keep:
+            self.emit(POP_TOP, stack_effect=-1)
+
+    def compile_NumberNode(self, node: NumberNode, keep):
+        self.emit(LOAD_CONST, Number.of(node.token.value), 1)
+        self.discard(keep)
+
+    def compile_BooleanNode(self, node: BooleanNode, keep):
+        self.emit(LOAD_CONST, Boolean.of(node.token.value), 1)
+        self.discard(keep)
+
+    def compile_StringNode(self, node: StringNode, keep):
+        self.emit(LOAD_CONST, String(node.token.value), 1)
+        self.discard(keep)
+
+    def compile_VariableAccessNode(self, node: VariableAccessNode, keep):
+        var_name = node.var_name_token.value
+        if node.slot and node.slot[0] == 0:
+            self.emit(
+                LOAD_SLOT, (node.slot[1], var_name, node.pos_start, node.pos_end), 1
+            )
+        else:
+            self.emit(LOAD_NAME, (var_name, node.pos_start, node.pos_end), 1)
+        self.discard(keep)
+
+    def compile_store(self, node):
+        """Stores the value on top of the stack into the node's variable"""
+        if node.slot and node.slot[0] == 0:
+            self.emit(STORE_SLOT, node.slot[1], -1)
+        else:
+            self.emit(STORE_NAME, node.var_name_token.value, -1)
+
+    def compile_VariableAssignNode(self, node: VariableAssignNode, keep):
+        self.compile(node.value_node, keep=True)
+        if keep:
+            self.emit(DUP_TOP, stack_effect=1)
+        self.compile_store(node)
+
+    def compile_ListNode(self, node: ListNode, keep):
+        for element_node in node.element_nodes:
+            self.compile(element_node, keep)
+        if keep:
+            count = len(node.element_nodes)
+            self.emit(BUILD_LIST, count, 1 - count)
+
+    def compile_BinaryOperatorNode(self, node: BinaryOperatorNode, keep):
+        end_label = Label()
+        self.compile(node.left_node, keep=True)
+        if node.short_circuit_on is not None:
+            self.emit(SHORT_CIRCUIT, (end_label, node.short_circuit_on))
+        self.compile(node.right_node, keep=True)
+        number_operation = node.number_operation
+        self.emit(
+            BINARY_OP,
+            (node.operator, number_operation, node.left_node, node.right_node),
+            -1,
+        )
+        self.mark(end_label)
+        self.discard(keep)
+
+    def compile_UnaryOperatorNode(self, node: UnaryOperatorNode, keep):
+        self.compile(node.node, keep=True)
+        if node.operator:
+            self.emit(UNARY_OP, (node.operator, node.node))
+        self.discard(keep)
+
+    def compile_IfNode(self, node: IfNode, keep):
+        end_label = Label()
+        start_depth = self.depth
+
+        for condition, expr, should_return_null in node.cases:
+            next_label = Label()
+            self.compile(condition, keep=True)
+            self.emit(POP_JUMP_IF_FALSE, next_label, -1)
+            self.compile_branch(expr, should_return_null, keep)
+            self.emit(JUMP, end_label)
+            self.mark(next_label)
+            self.depth = start_depth
+
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            self.compile_branch(expr, should_return_null, keep)
+        elif keep:
+            self.emit(LOAD_NULL, stack_effect=1)
+
+        self.mark(end_label)
+
+    def compile_branch(self, expr, should_return_null, keep):
+        self.compile(expr, keep=keep and not should_return_null)
+        if keep and should_return_null:
+            self.emit(LOAD_NULL, stack_effect=1)
+
+    def begin_loop(self, node, keep):
+        """Pushes the accumulator for loops whose List value is used"""
+        accumulate = keep and not node.should_return_null
+        if accumulate:
+            self.emit(NEW_ACCUMULATOR, stack_effect=1)
+        return accumulate
+
+    def compile_loop_body(self, node, loop: Loop, accumulate, accumulator_depth):
+        self.emit(STEP, loop_header(node))
+        self.loops.append(loop)
+        self.compile(node.body_node, keep=accumulate)
+        self.loops.pop()
+        if accumulate:
+            self.emit(ACCUMULATE, accumulator_depth, -1)
+
+    def end_loop(self, node, keep, accumulate):
+        if accumulate:
+            self.emit(BUILD_ACCUMULATED)
+        elif keep:
+            self.emit(LOAD_NULL, stack_effect=1)
+
+    def compile_ForNode(self, node: ForNode, keep):
+        accumulate = self.begin_loop(node, keep)
+        accumulator_depth = self.depth - 1
+
+        self.compile(node.list_node, keep=True)
+        self.emit(GET_ITER, (node.list_node.pos_start, node.list_node.pos_end))
+
+        loop = Loop(Label(), Label(), self.depth)
+        exit_label = Label()
+        self.mark(loop.continue_label)
+        self.emit(FOR_ITER, exit_label, 1)
+        self.compile_store(node)
+        self.compile_loop_body(node, loop, accumulate, accumulator_depth)
+        self.emit(JUMP, loop.continue_label)
+        self.mark(loop.break_label)
+        self.emit(POP_TOP)
+        self.mark(exit_label)
+        self.depth -= 1
+
+        self.end_loop(node, keep, accumulate)
+
+    def compile_WhileNode(self, node: WhileNode, keep):
+        self.compile_conditional_loop(node, keep, POP_JUMP_IF_FALSE)
+
+    def compile_RepeatUntilNode(self, node: RepeatUntilNode, keep):
+        self.compile_conditional_loop(node, keep, POP_JUMP_IF_TRUE)
+
+    def compile_conditional_loop(self, node, keep, exit_jump):
+        accumulate = self.begin_loop(node, keep)
+        accumulator_depth = self.depth - 1
+
+        loop = Loop(Label(), Label(), self.depth)
+        self.mark(loop.continue_label)
+        self.compile(node.condition_node, keep=True)
+        self.emit(exit_jump, loop.break_label, -1)
+        self.compile_loop_body(node, loop, accumulate, accumulator_depth)
+        self.emit(JUMP, loop.continue_label)
+        self.mark(loop.break_label)
+
+        self.end_loop(node, keep, accumulate)
+
+    def compile_RepeatNode(self, node: RepeatNode, keep):
+        accumulate = self.begin_loop(node, keep)
+        accumulator_depth = self.depth - 1
+
+        if node.count_token:
+            self.emit(GET_REPEAT_ITER, node.count_token.value, 1)
+        else:
+            self.compile(node.count_node, keep=True)
+            self.emit(GET_REPEAT_ITER)
+
+        loop = Loop(Label(), Label(), self.depth)
+        exit_label = Label()
+        self.mark(loop.continue_label)
+        self.emit(FOR_ITER, exit_label, 1)
+        self.emit(POP_TOP, stack_effect=-1)
+        self.compile_loop_body(node, loop, accumulate, accumulator_depth)
+        self.emit(JUMP, loop.continue_label)
+        self.mark(loop.break_label)
+        self.emit(POP_TOP)
+        self.mark(exit_label)
+        self.depth -= 1
+
+        self.end_loop(node, keep, accumulate)
+
+    def compile_FunctionDefinitionNode(self, node: FunctionDefinitionNode, keep):
+        func_name = node.var_name_token.value if node.var_name_token else None
+        body_compiler = BytecodeCompiler(func_name or "<anonymous>")
+        code = body_compiler.compile_function_body(
+            node.body_node, node.should_auto_return
+        )
+        arg_names = [arg_name.value for arg_name in node.arg_name_tokens]
+        self.emit(
+            MAKE_FUNCTION,
+            (
+                func_name,
+                code,
+                arg_names,
+                node.should_auto_return,
+                node.body_node,
+                node.slot_index,
+            ),
+            1,
+        )
+        self.discard(keep)
+
+    def compile_CallNode(self, node: CallNode, keep):
+        if node.callee_cache:
+            callee_node = node.node_to_call
+            self.emit(
+                LOAD_CALLEE,
+                (
+                    node.callee_cache,
+                    callee_node.var_name_token.value,
+                    callee_node.pos_start,
+                    callee_node.pos_end,
+                    node.pos_start,
+                    node.pos_end,
+                ),
+                1,
+            )
+        else:
+            self.compile(node.node_to_call, keep=True)
+        for arg_node in node.arg_nodes:
+            self.compile(arg_node, keep=True)
+        count = len(node.arg_nodes)
+        if node.tail_call:
+            self.emit(
+                TAIL_CALL, (count, node.pos_start, node.pos_end, node.tail_call), -count
+            )
+        else:
+            loop = self.loops[-1] if self.loops else None
+            self.emit(CALL, (count, node.pos_start, node.pos_end, loop), -count)
+        self.discard(keep)
+
+    def compile_ReturnNode(self, node: ReturnNode, keep):
+        if node.node_to_return:
+            self.compile(node.node_to_return, keep=True)
+        else:
+            self.emit(LOAD_NULL, stack_effect=1)
+        self.emit(RETURN_VALUE, stack_effect=-1)
+        # Keeps the depth consistent for code that follows a RETURN in an expression
+        if keep:
+            self.depth += 1
+
+    def compile_ContinueNode(self, node: ContinueNode, keep):
+        if self.loops:
+            loop = self.loops[-1]
+            self.emit(JUMP_CLEAR, (loop.continue_label, loop.depth))
+        else:
+            self.emit(CONTINUE_OUT)
+        if keep:
+            self.depth += 1
+
+    def compile_BreakNode(self, node: BreakNode, keep):
+        if self.loops:
+            loop = self.loops[-1]
+            self.emit(JUMP_CLEAR, (loop.break_label, loop.depth))
+        else:
+            self.emit(BREAK_OUT)
+        if keep:
+            self.depth += 1
@@ -0,0 +1,451 @@
+from values import *
+from interpreter import Function, BaseFunction, is_tail_call
+from utils.context import Context
+from utils.errors import RunTimeError
+from utils.results import (
+    RunTimeResult,
+    ReturnSignal,
+    TailCallSignal,
+    BreakSignal,
+    ContinueSignal,
+    ErrorSignal,
+)
+from lexer.tokens import *
+from parser.nodes import *
+from compiler.operators import operation_error
+
+
+class ClosureCompiler:
+    """
+    Turns every node into a Python closure once, so running the program no longer
+    has to dispatch through Interpreter.visit. A compiled node takes the current
+    context and returns a Value; RETURN, BREAK, CONTINUE and errors are raised
+    as the signals defined in utils.results.
+    """
+
+    def compile(self, node):
+        method_name = f"compile_{type(node).__name__}"
+        method = getattr(self, method_name, self.no_compile_method)
+        return method(node)
+
+    def compile_body(self, node):
+        """Compiles a node into a callable with the same contract as Interpreter.visit"""
+        code = self.compile(node)
+
+        def body(context: Context) -> RunTimeResult:
+            return RunTimeResult.capture(code, context)
+
+        return body
+
+    def no_compile_method(self, node):
+        raise Exception(f"No compile_{type(node).__name__}")
+
+    def compile_NumberNode(self, node: NumberNode):
+        return self.compile_literal(Number.of(node.token.value))
+
+    def compile_BooleanNode(self, node: BooleanNode):
+        return self.compile_literal(Boolean.of(node.token.value))
+
+    def compile_StringNode(self, node: StringNode):
+        return self.compile_literal(String(node.token.value))
+
+    def compile_literal(self, value: Value):
+        """Literals are immutable, so every evaluation can share one Value"""
+
+        def literal(context):
+            return value
+
+        return literal
+
+    def compile_VariableAccessNode(self, node: VariableAccessNode):
+        var_name = node.var_name_token.value
+        pos_start, pos_end = node.pos_start, node.pos_end
+
+        if node.slot and node.slot[0] == 0:
+            index = node.slot[1]
+
+            def access(context):
+                symbol_table = context.symbol_table
+                value = symbol_table.slots[index]
+                if value is None and symbol_table.parent:
+                    value = symbol_table.parent.get(var_name)
+                if value is None:
+                    raise ErrorSignal(
+                        RunTimeError(
+                            pos_start, pos_end, f"'{var_name}' is not defined", context
+                        )
+                    )
+                return value
+
+            return access
+
+        def access(context):
+            value = context.symbol_table.get(var_name)
+            if value is None:
+                raise ErrorSignal(
+                    RunTimeError(
+                        pos_start, pos_end, f"'{var_name}' is not defined", context
+                    )
+                )
+            return value
+
+        return access
+
+    def compile_VariableAssignNode(self, node: VariableAssignNode):
+        var_name = node.var_name_token.value
+        value_code = self.compile(node.value_node)
+
+        if node.slot and node.slot[0] == 0:
+            index = node.slot[1]
+
+            def assign(context):
+                value = value_code(context)
+                context.symbol_table.slots[index] = value
+                return value
+
+            return assign
+
+        def assign(context):
+            value = value_code(context)
+            context.symbol_table.set(var_name, value)
+            return value
+
+        return assign
+
+    def compile_ListNode(self, node: ListNode):
+        element_codes = [self.compile(element) for element in node.element_nodes]
+
+        if not node.value_used:
+
+            def block(context):
+                for element_code in element_codes:
+                    element_code(context)
+                return Number.null
+
+            return block
+
+        def list_(context):
+            return List([element_code(context) for element_code in element_codes])
+
+        return list_
+
+    def compile_BinaryOperatorNode(self, node: BinaryOperatorNode):
+        left_code = self.compile(node.left_node)
+        right_code = self.compile(node.right_node)
+        left_node, right_node = node.left_node, node.right_node
+        operator = node.operator
+
+        def fail(left, right, context):
+            raise ErrorSignal(
+                operation_error(
+                    operator, context, (left, left_node), (right, right_node)
+                )
+            )
+
+        if node.short_circuit_on is not None:
+            short_circuit_on = node.short_circuit_on
+
+            def binary_operation(context):
+                left = left_code(context)
+                if type(left) is Boolean and left.value == short_circuit_on:
+                    return left
+                right = right_code(context)
+                result, error = operator(left, right)
+                if error:
+                    fail(left, right, context)
+                return result
+
+            return binary_operation
+
+        if node.number_operation:
+            compute, make_result, check_zero = node.number_operation
+
+            def binary_operation(context):
+                left = left_code(context)
+                right = right_code(context)
+                if (
+                    type(left) is Number
+                    and type(right) is Number
+                    and not (check_zero and right.value == 0)
+                ):
+                    return make_result(compute(left.value, right.value))
+                result, error = operator(left, right)
+                if error:
+                    fail(left, right, context)
+                return result
+
+            return binary_operation
+
+        def binary_operation(context):
+            left = left_code(context)
+            right = right_code(context)
+            result, error = operator(left, right)
+            if error:
+                fail(left, right, context)
+            return result
+
+        return binary_operation
+
+    def compile_UnaryOperatorNode(self, node: UnaryOperatorNode):
+        operand_code = self.compile(node.node)
+        operand_node = node.node
+        operator = node.operator
+
+        if not operator:
+            return operand_code
+
+        def unary_operation(context):
+            operand = operand_code(context)
+            result, error = operator(operand)
+            if error:
+                raise ErrorSignal(
+                    operation_error(operator, context, (operand, operand_node))
+                )
+            return result
+
+        return unary_operation
+
+    def compile_IfNode(self, node: IfNode):
+        cases = [
+            (self.compile(condition), self.compile(expr), should_return_null)
+            for condition, expr, should_return_null in node.cases
+        ]
+        else_case = None
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            else_case = (self.compile(expr), should_return_null)
+
+        def if_(context):
+            for condition_code, expr_code, should_return_null in cases:
+                if condition_code(context).is_true():
+                    expr_value = expr_code(context)
+                    return Number.null if should_return_null else expr_value
+
+            if else_case:
+                expr_code, should_return_null = else_case
+                expr_value = expr_code(context)
+                return Number.null if should_return_null else expr_value
+
+            return Number.null
+
+        return if_
+
+    def compile_ForNode(self, node: ForNode):
+        var_name = node.var_name_token.value
+        slot = node.slot
+        list_code = self.compile(node.list_node)
+        body_code = self.compile(node.body_node)
+        list_pos_start, list_pos_end = node.list_node.pos_start, node.list_node.pos_end
+        header_start, header_end = loop_header(node)
+        should_return_null = node.should_return_null
+
+        def for_(context):
+            elements = None if should_return_null else []
+            iterable = list_code(context)
+
+            if not isinstance(iterable, List):
+                raise ErrorSignal(
+                    RunTimeError(
+                        list_pos_start,
+                        list_pos_end,
+                        "For loop can only iterate over a list",
+                        context,
+                    )
+                )
+
+            symbol_table = context.symbol_table
+            step = context.budget.step
+            for item in iterable.iterate():
+                if slot:
+                    symbol_table.set_slot(slot, item)
+                else:
+                    symbol_table.set(var_name, item)
+                if step():
+                    raise ErrorSignal(
+                        context.budget.error(header_start, header_end, context)
+                    )
+                try:
+                    value = body_code(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+
+            return Number.null if elements is None else List(elements)
+
+        return for_
+
+    def compile_WhileNode(self, node: WhileNode):
+        condition_code = self.compile(node.condition_node)
+        body_code = self.compile(node.body_node)
+        header_start, header_end = loop_header(node)
+        should_return_null = node.should_return_null
+
+        def while_(context):
+            elements = None if should_return_null else []
+
+            step = context.budget.step
+            while condition_code(context).is_true():
+                if step():
+                    raise ErrorSignal(
+                        context.budget.error(header_start, header_end, context)
+                    )
+                try:
+                    value = body_code(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+
+            return Number.null if elements is None else List(elements)
+
+        return while_
+
+    def compile_RepeatUntilNode(self, node: RepeatUntilNode):
+        condition_code = self.compile(node.condition_node)
+        body_code = self.compile(node.body_node)
+        header_start, header_end = loop_header(node)
+        should_return_null = node.should_return_null
+
+        def repeat_until(context):
+            elements = None if should_return_null else []
+
+            step = context.budget.step
+            while not condition_code(context).is_true():
+                if step():
+                    raise ErrorSignal(
+                        context.budget.error(header_start, header_end, context)
+                    )
+                try:
+                    value = body_code(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+
+            return Number.null if elements is None else List(elements)
+
+        return repeat_until
+
+    def compile_RepeatNode(self, node: RepeatNode):
+        count_token = node.count_token
+        count_code = None if count_token else self.compile(node.count_node)
+        body_code = self.compile(node.body_node)
+        header_start, header_end = loop_header(node)
+        should_return_null = node.should_return_null
+
+        def repeat(context):
+            elements = None if should_return_null else []
+            count = count_token or count_code(context)
+
+            step = context.budget.step
+            for i in range(count.value):
+                if step():
+                    raise ErrorSignal(
+                        context.budget.error(header_start, header_end, context)
+                    )
+                try:
+                    value = body_code(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+
+            return Number.null if elements is None else List(elements)
+
+        return repeat
+
+    def compile_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        func_name = node.var_name_token.value if node.var_name_token else None
+        body_node = node.body_node
+        body_code = self.compile_body(body_node)
+        arg_names = [arg_name.value for arg_name in node.arg_name_tokens]
+        should_auto_return = node.should_auto_return
+        slot_index = node.slot_index
+
+        def function_definition(context):
+            func_value = Function(
+                func_name,
+                body_node,
+                arg_names,
+                should_auto_return,
+                body_code=body_code,
+                slot_index=slot_index,
+            )
+
+            if func_name:
+                context.symbol_table.set(func_name, func_value)
+
+            return func_value
+
+        return function_definition
+
+    def compile_CallNode(self, node: CallNode):
+        callee_code = self.compile(node.node_to_call)
+        if node.callee_cache:
+            callee_code = self.cached_callee(node, callee_code)
+        arg_codes = [self.compile(arg_node) for arg_node in node.arg_nodes]
+        pos_start, pos_end = node.pos_start, node.pos_end
+        tail_call = node.tail_call
+
+        def call(context):
+            value_to_call = callee_code(context)
+            args = [arg_code(context) for arg_code in arg_codes]
+
+            if tail_call and is_tail_call(tail_call, value_to_call, args):
+                budget = context.budget
+                if budget.step():
+                    raise ErrorSignal(budget.error(pos_start, pos_end, context))
+                raise TailCallSignal(value_to_call, args)
+
+            result = value_to_call.execute(args, context, pos_start, pos_end)
+            if result.should_return():
+                result.raise_signal()
+
+            return result.value
+
+        return call
+
+    def cached_callee(self, node: CallNode, callee_code):
+        cache = node.callee_cache
+        pos_start, pos_end = node.pos_start, node.pos_end
+
+        def cached(context):
+            value_to_call = cache.get()
+            if value_to_call is None:
+                value_to_call = callee_code(context)
+                if isinstance(value_to_call, BaseFunction):
+                    cache.fill(
+                        context.symbol_table, value_to_call.at_call(pos_start, pos_end)
+                    )
+            return value_to_call
+
+        return cached
+
+    def compile_ReturnNode(self, node: ReturnNode):
+        value_code = self.compile(node.node_to_return) if node.node_to_return else None
+
+        def return_(context):
+            raise ReturnSignal(value_code(context) if value_code else Number.null)
+
+        return return_
+
+    def compile_ContinueNode(self, node: ContinueNode):
+        def continue_(context):
+            raise ContinueSignal()
+
+        return continue_
+
+    def compile_BreakNode(self, node: BreakNode):
+        def break_(context):
+            raise BreakSignal()
+
+        return break_
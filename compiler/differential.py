@@ -0,0 +1,626 @@
+"""
+Differential test harness for the execution engines.
+
+Runs every program under each engine and reports any difference in DISPLAY
+output, the program's value, the error text or the steps it took. The tokens
+RegexLexer makes for each program are checked against Lexer's too.
+
+    python -m compiler.differential                 # built-in programs
+    python -m compiler.differential code.txt ...    # your own programs
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from interpreter import Session
+from lexer.lexer import Lexer
+from lexer.regex_lexer import RegexLexer
+
+
+ENGINES = ("tree", "closure", "bytecode", "stackless")
+
+PROGRAMS = {
+    "arithmetic": """
+a = 7
+b = 2
+DISPLAY(a + b * 3 - 1)
+DISPLAY(a / b)
+DISPLAY(a MOD b)
+DISPLAY(a % b)
+DISPLAY(2 ^ 10)
+DISPLAY(2 ** 3 ** 2)
+DISPLAY(-a + +b)
+DISPLAY((a + b) * (a - b))
+DISPLAY(1.5 * 4)
+a + b
+""",
+    "comparisons and logic": """
+x = 5
+DISPLAY(x == 5)
+DISPLAY(x != 5)
+DISPLAY(x < 10 AND x > 1)
+DISPLAY(x <= 4 OR x >= 5)
+DISPLAY(NOT (x == 5))
+DISPLAY(TRUE == FALSE)
+DISPLAY(TRUE + TRUE)
+DISPLAY(TRUE AND FALSE OR TRUE)
+""",
+    "constant folding": """
+DISPLAY(2 * 60 * 60)
+DISPLAY(-5 + 2 ^ 3)
+DISPLAY(NOT TRUE)
+DISPLAY("ab" * 3 + "c")
+DISPLAY(1 < 2 AND 3 >= 3)
+DISPLAY(7 / 2)
+DISPLAY(2 ^ 100000 > 1)
+PROCEDURE f(x) {
+    IF (FALSE) {
+        RETURN 1
+    } ELIF (x > 1) {
+        RETURN 2
+    } ELIF (1 == 1) {
+        RETURN 3
+    } ELSE {
+        RETURN 4
+    }
+}
+DISPLAY(f(5))
+DISPLAY(f(0))
+y = IF (0) { 1 } ELSE { 2 }
+DISPLAY(y)
+z = IF ("") { 1 } ELIF (FALSE) { 2 } ELSE { 3 }
+DISPLAY(z)
+w = IF (TRUE) { 9 } ELSE { 8 }
+DISPLAY(w)
+DISPLAY(10 / (3 - 3))
+""",
+    "short circuit": """
+calls = 0
+PROCEDURE slow(result) {
+    calls = calls + 1
+    DISPLAY("slow called")
+    RETURN result
+}
+DISPLAY(FALSE AND slow(TRUE))
+DISPLAY(TRUE OR slow(FALSE))
+DISPLAY(TRUE AND slow(FALSE))
+DISPLAY(FALSE OR slow(TRUE))
+DISPLAY(calls)
+x = 5
+DISPLAY(x > 10 AND slow(TRUE))
+DISPLAY(x > 1 OR undefined_name)
+DISPLAY(x < 1 OR FALSE)
+DISPLAY(FALSE AND 5)
+i = 0
+WHILE (i < 3 AND slow(TRUE)) {
+    i = i + 1
+}
+DISPLAY(calls)
+DISPLAY(TRUE AND 5)
+""",
+    "strings": """
+s = "abc"
+DISPLAY(s + "def")
+DISPLAY(s * 3)
+DISPLAY("tab\\tand\\nnewline \\"quoted\\"")
+s
+""",
+    "lists": """
+l = [1, 2, 3]
+DISPLAY(l)
+DISPLAY(l / 0)
+DISPLAY(l * [4, 5])
+DISPLAY(l - 0)
+APPEND(l, "x")
+INSERT(l, 0, TRUE)
+DISPLAY(REMOVE(l, 1))
+DISPLAY(LENGTH(l))
+m = l
+APPEND(m, 99)
+DISPLAY(l)
+n = l + 7
+DISPLAY(l)
+DISPLAY(n)
+DISPLAY([])
+[l, [1, [2]]]
+""",
+    "if elif else": """
+PROCEDURE grade(score) {
+    IF (score >= 90) {
+        RETURN "A"
+    } ELIF (score >= 80) {
+        RETURN "B"
+    } ELIF (score >= 70) {
+        RETURN "C"
+    } ELSE {
+        RETURN "F"
+    }
+}
+DISPLAY(grade(95))
+DISPLAY(grade(85))
+DISPLAY(grade(75))
+DISPLAY(grade(10))
+x = IF (TRUE) { 5 }
+""",
+    "loops": """
+i = 0
+total = 0
+WHILE (i < 10) {
+    i = i + 1
+    IF (i MOD 2 == 0) {
+        CONTINUE
+    } ELSE {
+        total = total + i
+    }
+    IF (i > 7) {
+        BREAK
+    }
+}
+DISPLAY(total)
+REPEAT UNTIL (i == 0) {
+    i = i - 1
+}
+DISPLAY(i)
+count = 3
+REPEAT count TIMES {
+    DISPLAY("repeat")
+}
+REPEAT 5 TIMES {
+    count = count + 1
+    IF (count > 5) {
+        BREAK
+    }
+}
+DISPLAY(count)
+items = [1, 2, 3]
+FOR EACH item IN items {
+    IF (item == 2) {
+        CONTINUE
+    } ELSE {
+        DISPLAY(item)
+    }
+}
+DISPLAY(item)
+""",
+    "nested loops": """
+out = []
+REPEAT 3 TIMES {
+    j = 0
+    WHILE (TRUE) {
+        j = j + 1
+        IF (j > 3) {
+            BREAK
+        } ELSE {
+            out = out + j
+        }
+    }
+}
+DISPLAY(out)
+""",
+    "procedures": """
+PROCEDURE fib(n) {
+    IF (n < 2) {
+        RETURN n
+    } ELSE {
+        RETURN fib(n - 1) + fib(n - 2)
+    }
+}
+DISPLAY(fib(15))
+PROCEDURE sum(n, acc) {
+    IF (n == 0) {
+        RETURN acc
+    } ELSE {
+        RETURN sum(n - 1, acc + n)
+    }
+}
+DISPLAY(sum(50, 0))
+PROCEDURE noreturn(a) {
+    a = a + 1
+}
+DISPLAY(noreturn(1))
+PROCEDURE early() {
+    RETURN
+}
+DISPLAY(early())
+PROCEDURE outer(x) {
+    PROCEDURE inner(y) {
+        RETURN y * 2
+    }
+    RETURN inner(x) + 1
+}
+DISPLAY(outer(4))
+f = PROCEDURE (a, b) {
+    RETURN a - b
+}
+DISPLAY(f(10, 3))
+DISPLAY(inner(10))
+""",
+    "dynamic scope": """
+PROCEDURE show() {
+    DISPLAY(secret)
+}
+PROCEDURE caller() {
+    secret = "from caller"
+    show()
+}
+secret = "global"
+caller()
+show()
+PROCEDURE shadow(x) {
+    x = x + secret
+    RETURN x
+}
+DISPLAY(shadow("s"))
+""",
+    "procedure locals": """
+PROCEDURE late() {
+    DISPLAY(v)
+    v = 2
+    DISPLAY(v)
+}
+v = 1
+late()
+DISPLAY(v)
+PROCEDURE total(xs) {
+    sum = 0
+    FOR EACH x IN xs {
+        sum = sum + x
+    }
+    RETURN sum
+}
+DISPLAY(total([1, 2, 3, 4]))
+PROCEDURE depth(n) {
+    IF (n == 0) {
+        RETURN 0
+    } ELSE {
+        before = n
+        after = depth(n - 1)
+        RETURN before + after
+    }
+}
+DISPLAY(depth(30))
+""",
+    "break through procedure": """
+PROCEDURE stop() {
+    BREAK
+}
+PROCEDURE skip() {
+    CONTINUE
+}
+i = 0
+WHILE (i < 5) {
+    i = i + 1
+    IF (i == 2) {
+        skip()
+    } ELSE {
+        DISPLAY(i)
+    }
+    IF (i == 4) {
+        stop()
+    }
+}
+DISPLAY(i)
+""",
+    "tail calls": """
+PROCEDURE sum(n, acc) {
+    IF (n == 0) {
+        RETURN acc
+    } ELSE {
+        RETURN sum(n - 1, acc + n)
+    }
+}
+DISPLAY(sum(300, 0))
+PROCEDURE even(n) {
+    IF (n == 0) {
+        RETURN TRUE
+    } ELSE {
+        RETURN odd(n - 1)
+    }
+}
+PROCEDURE odd(n) {
+    IF (n == 0) {
+        RETURN FALSE
+    } ELSE {
+        RETURN even(n - 1)
+    }
+}
+DISPLAY(even(2001))
+PROCEDURE outer(secret) {
+    RETURN peek()
+}
+PROCEDURE peek() {
+    RETURN secret
+}
+DISPLAY(outer(42))
+PROCEDURE stop() {
+    BREAK
+}
+PROCEDURE relay() {
+    RETURN stop()
+}
+nums = [1, 2, 3]
+FOR EACH i IN nums {
+    DISPLAY(i)
+    relay()
+}
+PROCEDURE shout(x) {
+    RETURN DISPLAY(x)
+}
+shout("hi")
+""",
+    "input": """
+name = INPUT()
+age = INPUT()
+DISPLAY(name + "!")
+DISPLAY(age + 1)
+blank = INPUT()
+DISPLAY(blank)
+""",
+    "undefined variable": """
+x = 1
+DISPLAY(y)
+""",
+    "division by zero": """
+x = 10
+DISPLAY(x / (5 - 5))
+""",
+    "modulo by zero": """
+DISPLAY(3 MOD 0)
+""",
+    "illegal operation": """
+DISPLAY("a" - 1)
+""",
+    "error in procedure": """
+PROCEDURE inner(a) {
+    RETURN a / 0
+}
+PROCEDURE outer(a) {
+    RETURN inner(a) + 1
+}
+DISPLAY("before")
+outer(1)
+""",
+    "wrong argument count": """
+PROCEDURE f(a, b) {
+    RETURN a
+}
+f(1)
+""",
+    "too many arguments": """
+APPEND([1], 2, 3)
+""",
+    "for over non list": """
+x = 5
+FOR EACH i IN x {
+    DISPLAY(i)
+}
+""",
+    "bad builtin argument": """
+LENGTH(5)
+""",
+    "call non function": """
+x = 5
+x(1)
+""",
+    "not on number": """
+DISPLAY(NOT 5)
+""",
+    "index out of bounds": """
+l = [1]
+DISPLAY(l / 3)
+""",
+    "error in tail call": """
+PROCEDURE fail(n) {
+    IF (n == 0) {
+        RETURN 1 / 0
+    } ELSE {
+        RETURN fail(n - 1)
+    }
+}
+fail(5)
+""",
+    "top level return": """
+DISPLAY(1)
+RETURN 5
+DISPLAY(2)
+""",
+    "top level break": """
+DISPLAY(1)
+BREAK
+""",
+    "syntax error": """
+x = (1 + 2
+""",
+    "changing a list in its for loop": """
+l = [1, 2, 3]
+FOR EACH x IN l {
+    DISPLAY(x)
+    APPEND(l, x * 10)
+    IF (x == 1) {
+        INSERT(l, 1, 9)
+    } ELIF (x == 2) {
+        REMOVE(l, 1)
+    }
+}
+DISPLAY(l)
+""",
+    "lexing error after a parser crash": """
+DISPLAY(2>= ^ 3)
+BR2.5EAK
+""",
+    "RUN without short circuit": """
+RUN("{scripts}/short_circuit.txt")
+""",
+    "endless while": """
+i = 0
+WHILE (TRUE) {
+    i = i + 1
+}
+""",
+    "endless repeat until": """
+PROCEDURE tick(n) {
+    RETURN n + 1
+}
+n = 0
+REPEAT UNTIL (n < 0) {
+    n = tick(n)
+}
+""",
+    "endless tail calls": """
+PROCEDURE loop(n) {
+    RETURN loop(n + 1)
+}
+loop(0)
+""",
+    "endless loop in procedure": """
+PROCEDURE spin(items) {
+    FOR EACH item IN items {
+        REPEAT UNTIL (FALSE) {
+            APPEND(items, item)
+        }
+    }
+}
+spin([1])
+""",
+}
+
+STDIN = {"input": "Ada\n41\n\n"}
+
+# Scripts the programs RUN, written to a temporary directory that {scripts} in
+# a program stands for
+SCRIPTS = {
+    "short_circuit.txt": """
+calls = []
+PROCEDURE counted(result) {
+    APPEND(calls, 1)
+    RETURN result
+}
+x = TRUE OR counted(FALSE)
+y = FALSE AND counted(TRUE)
+DISPLAY(LENGTH(calls))
+""",
+}
+
+# Session.run settings of the programs that don't run with the defaults
+SETTINGS = {"RUN without short circuit": {"short_circuit": False}}
+
+# How the error of a program has to start, for programs that once failed differently
+ERRORS = {"lexing error after a parser crash": "Illegal Character: '.'"}
+
+# What a program has to DISPLAY, for programs whose engines once agreed on the
+# wrong thing
+OUTPUTS = {"RUN without short circuit": "2\n"}
+
+# Stops the endless programs, well past what the others take
+MAX_STEPS = 20000
+
+
+def execute(source, mode, stdin="", fn="<program>", settings=None):
+    """Runs source and returns (output, value, error, steps) as strings"""
+    stdout = io.StringIO()
+    real_stdin = sys.stdin
+    sys.stdin = io.StringIO(stdin)
+    try:
+        with contextlib.redirect_stdout(stdout):
+            try:
+                # A session of its own, so nothing a program defines leaks into the next
+                session = Session()
+                value, error = session.run(
+                    fn, source, mode=mode, max_steps=MAX_STEPS, **(settings or {})
+                )
+            except Exception as e:
+                return stdout.getvalue(), None, f"{type(e).__name__}: {e}", None
+    finally:
+        sys.stdin = real_stdin
+
+    steps = str(session.budget.steps) if session.budget else None
+    return stdout.getvalue(), repr(value), error.as_string() if error else None, steps
+
+
+def lex(lexer_class, source, fn="<program>"):
+    """Returns every token's type, value and span, or the error text"""
+    tokens, error = lexer_class(fn, source).make_tokens()
+    if error:
+        return error.as_string()
+    return [(token.type, token.value, token.start, token.end) for token in tokens]
+
+
+def compare(source, engines=ENGINES, stdin="", error=None, output=None, settings=None):
+    """
+    Returns a description of every engine that disagrees with the first one,
+    and of the first one's error if it doesn't start with error or its output
+    if it isn't output
+    """
+    expected = execute(source, engines[0], stdin, settings=settings)
+    mismatches = []
+
+    if error is not None and not (expected[2] or "").startswith(error):
+        mismatches.append(
+            f"{engines[0]} error should start with {error!r}:\n  {expected[2]!r}"
+        )
+    if output is not None and expected[0] != output:
+        mismatches.append(
+            f"{engines[0]} output should be {output!r}:\n  {expected[0]!r}"
+        )
+
+    want, got = lex(Lexer, source), lex(RegexLexer, source)
+    if want != got:
+        mismatches.append(
+            f"RegexLexer tokens differ from Lexer:\n  Lexer: {want!r}\n  RegexLexer: {got!r}"
+        )
+
+    for engine in engines[1:]:
+        actual = execute(source, engine, stdin, settings=settings)
+        labels = ("output", "value", "error", "steps")
+        for label, want, got in zip(labels, expected, actual):
+            if want != got:
+                mismatches.append(
+                    f"{engine} {label} differs from {engines[0]}:\n"
+                    f"  {engines[0]}: {want!r}\n  {engine}: {got!r}"
+                )
+
+    return mismatches
+
+
+def main(argv):
+    if argv:
+        programs = {}
+        for fn in argv:
+            with open(fn, "r") as f:
+                programs[fn] = f.read()
+    else:
+        programs = PROGRAMS
+
+    failures = 0
+    scripts = tempfile.TemporaryDirectory()
+    for name, script in SCRIPTS.items():
+        with open(os.path.join(scripts.name, name), "w") as f:
+            f.write(script)
+    for name, source in programs.items():
+        source = source.replace("{scripts}", scripts.name.replace("\\", "/"))
+        mismatches = compare(
+            source,
+            stdin=STDIN.get(name, ""),
+            error=ERRORS.get(name),
+            output=OUTPUTS.get(name),
+            settings=SETTINGS.get(name),
+        )
+        if mismatches:
+            failures += 1
+            print(f"FAIL {name}")
+            for mismatch in mismatches:
+                print("  " + mismatch.replace("\n", "\n  "))
+        else:
+            print(f"ok   {name}")
+
+    scripts.cleanup()
+
+    print(f"\n{len(programs) - failures}/{len(programs)} programs agree on {', '.join(ENGINES)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,138 @@
+import operator
+
+from values import Number, Boolean, Value
+from lexer.tokens import *
+
+
+BINARY_METHODS = {
+    TYPE_PLUS: "added_to",
+    TYPE_MINUS: "subract_by",
+    TYPE_MUL: "multiply_by",
+    TYPE_DIV: "divide_by",
+    (TYPE_KEYWORD, "MOD"): "mod_by",
+    TYPE_POW: "power_by",
+    TYPE_EE: "get_comparison_eq",
+    TYPE_NE: "get_comparison_ne",
+    TYPE_LT: "get_comparison_lt",
+    TYPE_GT: "get_comparison_gt",
+    TYPE_LTE: "get_comparison_lte",
+    TYPE_GTE: "get_comparison_gte",
+    (TYPE_KEYWORD, "AND"): "and_by",
+    (TYPE_KEYWORD, "OR"): "or_by",
+}
+
+# Python operator computing Number x Number for each method, and what makes the result Value
+NUMBER_OPERATIONS = {
+    "added_to": (operator.add, Number.of),
+    "subract_by": (operator.sub, Number.of),
+    "multiply_by": (operator.mul, Number.of),
+    "divide_by": (operator.truediv, Number.of),
+    "mod_by": (operator.mod, Number.of),
+    "power_by": (operator.pow, Number.of),
+    "get_comparison_eq": (operator.eq, Boolean.of),
+    "get_comparison_ne": (operator.ne, Boolean.of),
+    "get_comparison_lt": (operator.lt, Boolean.of),
+    "get_comparison_gt": (operator.gt, Boolean.of),
+    "get_comparison_lte": (operator.le, Boolean.of),
+    "get_comparison_gte": (operator.ge, Boolean.of),
+}
+
+MINUS_ONE = Number.of(-1)
+
+# Left operand value that decides AND / OR on its own, so the right operand can be skipped
+SHORT_CIRCUIT_VALUES = {"and_by": False, "or_by": True}
+
+def binary_method_name(operator_token: Token):
+    """Returns the Value method that implements a binary operator token."""
+    if operator_token.type == TYPE_KEYWORD:
+        return BINARY_METHODS.get((operator_token.type, operator_token.value))
+    return BINARY_METHODS.get(operator_token.type)
+
+
+def binary_operator(operator_token: Token, specialize_numbers=True):
+    """
+    Returns the handler for a binary operator token. A handler takes the left
+    and right Values and returns (result, error) like the Value methods do.
+    With specialize_numbers=False it's always the plain method dispatch, which
+    benchmarks/comparisons.py times the fast paths against.
+    """
+    method_name = binary_method_name(operator_token)
+    if method_name is None:
+        return None
+    if specialize_numbers and method_name in NUMBER_OPERATORS:
+        return NUMBER_OPERATORS[method_name]
+    return METHOD_OPERATORS[method_name]
+
+
+def unary_operator(operator_token: Token):
+    """Returns the handler for a unary operator token, or None for a unary plus"""
+    if operator_token.type == TYPE_MINUS:
+        return negated
+    if operator_token.matches(TYPE_KEYWORD, "NOT"):
+        return notted
+    return None
+
+
+def negated(operand: Value):
+    return operand.multiply_by(MINUS_ONE)
+
+
+def notted(operand: Value):
+    return operand.notted()
+
+
+def operation_error(operator, context, *operands):
+    """
+    Values don't carry their position, so a failed operation is run again on
+    copies of its operands placed at their nodes. The error then points at
+    whichever operand the Value method blames. operands are (value, node) pairs.
+    """
+    _, error = operator(
+        *(value.located(node.pos_start, node.pos_end, context) for value, node in operands)
+    )
+    return error
+
+
+def short_circuit_value(operator_token: Token):
+    """Returns the Boolean value of a left operand that decides the operator, or None"""
+    return SHORT_CIRCUIT_VALUES.get(binary_method_name(operator_token))
+
+
+def method_operator(method_name):
+    def handler(left, right):
+        return getattr(left, method_name)(right)
+
+    handler.__name__ = handler.__qualname__ = method_name
+    return handler
+
+
+def number_operator(method_name, compute, make_result):
+    """
+    Computes Number x Number directly, skipping the isinstance checks in the
+    Value methods. Every other pair of operands, and division by zero, goes
+    through the method so the errors stay the same.
+    """
+    check_zero = method_name in ("divide_by", "mod_by")
+
+    def handler(left, right):
+        if (
+            type(left) is Number
+            and type(right) is Number
+            and not (check_zero and right.value == 0)
+        ):
+            return make_result(compute(left.value, right.value)), None
+        return getattr(left, method_name)(right)
+
+    handler.__name__ = handler.__qualname__ = method_name
+    # Lets compilers inline the fast path instead of calling the handler
+    handler.number_operation = (compute, make_result, check_zero)
+    return handler
+
+
+METHOD_OPERATORS = {
+    method_name: method_operator(method_name) for method_name in BINARY_METHODS.values()
+}
+NUMBER_OPERATORS = {
+    method_name: number_operator(method_name, compute, make_result)
+    for method_name, (compute, make_result) in NUMBER_OPERATIONS.items()
+}
@@ -0,0 +1,209 @@
+from values import *
+from lexer.tokens import *
+from parser.nodes import *
+from compiler.operators import binary_method_name, binary_operator, unary_operator
+
+
+# Folding is skipped when it would build something this big ahead of time
+MAX_FOLDED_EXPONENT = 64
+MAX_FOLDED_STRING_LENGTH = 1000
+
+LITERAL_NODES = (NumberNode, BooleanNode, StringNode)
+LOOP_NODES = (ForNode, WhileNode, RepeatUntilNode, RepeatNode)
+
+
+class Optimizer:
+    """
+    Rewrites the parsed tree before it runs. Operators whose operands are all
+    literals are folded into a single literal, and IF cases whose condition is a
+    literal are pruned.
+
+    Statement blocks and loops whose value is never used are marked so they
+    don't build the List they would evaluate to, which would otherwise keep
+    every statement's value of every iteration alive.
+
+    A folded literal keeps the positions of the expression it replaced, so any
+    error it takes part in later points at the same text. Expressions that would
+    fail, like 1 / 0 or "a" - 1, are left alone to fail at run time as before.
+    """
+
+    def optimize(self, node):
+        """Returns node, or the node that replaces it"""
+        method_name = f"optimize_{type(node).__name__}"
+        method = getattr(self, method_name, None)
+        return method(node) if method else node
+
+    def optimize_ListNode(self, node: ListNode):
+        node.element_nodes = [self.optimize(element) for element in node.element_nodes]
+        return node
+
+    def optimize_VariableAssignNode(self, node: VariableAssignNode):
+        node.value_node = self.optimize(node.value_node)
+        return node
+
+    def optimize_BinaryOperatorNode(self, node: BinaryOperatorNode):
+        node.left_node = self.optimize(node.left_node)
+        node.right_node = self.optimize(node.right_node)
+        if not (
+            isinstance(node.left_node, LITERAL_NODES)
+            and isinstance(node.right_node, LITERAL_NODES)
+        ):
+            return node
+
+        left = literal_value(node.left_node)
+        right = literal_value(node.right_node)
+        method_name = binary_method_name(node.operator_token)
+        if not self.is_cheap(method_name, left, right):
+            return node
+
+        try:
+            result, error = binary_operator(node.operator_token)(left, right)
+        except (ArithmeticError, TypeError, ValueError):
+            return node
+        if error:
+            return node
+        return literal_node(result, node) or node
+
+    def optimize_UnaryOperatorNode(self, node: UnaryOperatorNode):
+        node.node = self.optimize(node.node)
+        if not isinstance(node.node, LITERAL_NODES):
+            return node
+
+        operand = literal_value(node.node)
+        error = None
+        operator = unary_operator(node.operator_token)
+        if operator:
+            result, error = operator(operand)
+        else:
+            result = operand
+
+        if error:
+            return node
+        return literal_node(result, node) or node
+
+    def optimize_IfNode(self, node: IfNode):
+        cases = []
+        else_case = node.else_case
+
+        for condition, expr, should_return_null in node.cases:
+            condition = self.optimize(condition)
+            expr = self.optimize(expr)
+            if should_return_null:
+                self.discard(expr)
+            if not isinstance(condition, LITERAL_NODES):
+                cases.append((condition, expr, should_return_null))
+            elif literal_value(condition).is_true():
+                # Nothing after an always true case can run, so it becomes the ELSE
+                else_case = (expr, should_return_null)
+                break
+        else:
+            if else_case:
+                expr, should_return_null = else_case
+                expr = self.optimize(expr)
+                if should_return_null:
+                    self.discard(expr)
+                else_case = (expr, should_return_null)
+
+        if not cases and else_case and not else_case[1]:
+            return else_case[0]
+
+        node.cases = cases
+        node.else_case = else_case
+        return node
+
+    def optimize_ForNode(self, node: ForNode):
+        node.list_node = self.optimize(node.list_node)
+        node.body_node = self.optimize(node.body_node)
+        return self.optimize_loop(node)
+
+    def optimize_WhileNode(self, node: WhileNode):
+        node.condition_node = self.optimize(node.condition_node)
+        node.body_node = self.optimize(node.body_node)
+        return self.optimize_loop(node)
+
+    def optimize_RepeatUntilNode(self, node: RepeatUntilNode):
+        node.condition_node = self.optimize(node.condition_node)
+        node.body_node = self.optimize(node.body_node)
+        return self.optimize_loop(node)
+
+    def optimize_RepeatNode(self, node: RepeatNode):
+        if node.count_node:
+            node.count_node = self.optimize(node.count_node)
+        node.body_node = self.optimize(node.body_node)
+        return self.optimize_loop(node)
+
+    def optimize_loop(self, node):
+        if node.should_return_null:
+            self.discard(node.body_node)
+        return node
+
+    def optimize_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        node.body_node = self.optimize(node.body_node)
+        if not node.should_auto_return:
+            self.discard(node.body_node)
+        return node
+
+    def optimize_CallNode(self, node: CallNode):
+        node.node_to_call = self.optimize(node.node_to_call)
+        node.arg_nodes = [self.optimize(arg_node) for arg_node in node.arg_nodes]
+        return node
+
+    def optimize_ReturnNode(self, node: ReturnNode):
+        if node.node_to_return:
+            node.node_to_return = self.optimize(node.node_to_return)
+        return node
+
+    def discard(self, node):
+        """Marks an optimized node whose value is never used, and the nodes inside it whose value only it uses"""
+        if isinstance(node, ListNode):
+            if node.value_used:
+                node.value_used = False
+                for element_node in node.element_nodes:
+                    self.discard(element_node)
+        elif isinstance(node, LOOP_NODES):
+            if not node.should_return_null:
+                node.should_return_null = True
+                self.discard(node.body_node)
+        elif isinstance(node, IfNode):
+            for _, expr, _ in node.cases:
+                self.discard(expr)
+            node.cases = [(condition, expr, True) for condition, expr, _ in node.cases]
+            if node.else_case:
+                self.discard(node.else_case[0])
+                node.else_case = (node.else_case[0], True)
+
+    def is_cheap(self, method_name, left: Value, right: Value):
+        """Whether the operation is small enough to do ahead of time"""
+        if method_name == "power_by" and isinstance(right, Number):
+            return abs(right.value) <= MAX_FOLDED_EXPONENT
+        if method_name == "multiply_by" and isinstance(left, String):
+            return (
+                isinstance(right, Number)
+                and len(left.value) * right.value <= MAX_FOLDED_STRING_LENGTH
+            )
+        return True
+
+
+def literal_value(node) -> Value:
+    """Builds the Value a literal node evaluates to"""
+    if isinstance(node, NumberNode):
+        return Number.of(node.token.value)
+    if isinstance(node, BooleanNode):
+        return Boolean.of(node.token.value)
+    return String(node.token.value)
+
+
+def literal_node(value: Value, original):
+    """Builds a literal node for value spanning original, or None if there's no literal for it"""
+    if isinstance(value, Number):
+        type_ = TYPE_FLOAT if isinstance(value.value, float) else TYPE_INT
+        return NumberNode(Token(type_, value.value, original.pos_start, original.pos_end))
+    if isinstance(value, Boolean):
+        return BooleanNode(
+            Token(TYPE_KEYWORD, value.value, original.pos_start, original.pos_end)
+        )
+    if isinstance(value, String):
+        return StringNode(
+            Token(TYPE_STRING, value.value, original.pos_start, original.pos_end)
+        )
+    return None
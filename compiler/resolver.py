@@ -0,0 +1,128 @@
+from parser.nodes import *
+from compiler.operators import binary_operator, unary_operator, short_circuit_value
+from utils.context import CalleeCache
+
+
+# Turned off by benchmarks/calls.py to time calls that look their callee up every time
+CACHE_CALLEES = True
+
+
+class ProcedureNames:
+    """
+    What the Resolver learned about the procedures of every program run against
+    one global symbol table. Procedures stay in the table after their program
+    ends, so later programs (REPL lines, RUN scripts) can call them.
+    """
+
+    def __init__(self):
+        self.free = set()  # names procedures read from their callers' frames
+        self.local = set()  # names some procedure keeps in its own frame
+
+
+class Resolver:
+    """
+    Gives every procedure local a fixed index in its frame and annotates the
+    VariableAccessNode, VariableAssignNode and ForNode that use it with a
+    (depth, index) slot.
+
+    A procedure's locals are its parameters and every name it assigns, loops
+    over or defines a procedure as. Anything else is resolved by name at run
+    time: procedures see their caller's variables, so a free name could be in
+    any frame of the call stack, and top level names live in the global symbol
+    table shared with RUN-loaded scripts and the REPL.
+
+    It also finds the tail calls, RETURN f(...) outside any loop, which may
+    replace their procedure's frame with f's. That's only safe while no
+    procedure reads one of the replaced procedure's locals as a free name,
+    since f and everything it calls would otherwise see them through the
+    caller chain. names is shared by every program run against the same
+    globals, and each tail call checks it when it runs.
+
+    Calls of a name that isn't a local of the calling procedure get a
+    CalleeCache, and operator nodes get the handler of their operator.
+    """
+
+    def __init__(self, names: ProcedureNames = None, specialize_numbers=True):
+        self.names = ProcedureNames() if names is None else names
+        self.specialize_numbers = specialize_numbers
+
+    def resolve(self, node):
+        self.visit(node, None)
+        return node
+
+    def visit(self, node, scope):
+        if isinstance(node, FunctionDefinitionNode):
+            self.resolve_function(node)
+            return
+
+        if scope is not None and isinstance(
+            node, (VariableAccessNode, VariableAssignNode, ForNode)
+        ):
+            index = scope.get(node.var_name_token.value)
+            if index is not None:
+                node.slot = (0, index)
+            elif isinstance(node, VariableAccessNode):
+                self.names.free.add(node.var_name_token.value)
+
+        if (
+            CACHE_CALLEES
+            and isinstance(node, CallNode)
+            and isinstance(node.node_to_call, VariableAccessNode)
+        ):
+            name = node.node_to_call.var_name_token.value
+            if scope is None or name not in scope:
+                node.callee_cache = CalleeCache(name, self.names.local)
+
+        if isinstance(node, BinaryOperatorNode):
+            node.operator = binary_operator(
+                node.operator_token, self.specialize_numbers
+            )
+            node.number_operation = getattr(node.operator, "number_operation", None)
+            if node.short_circuit:
+                node.short_circuit_on = short_circuit_value(node.operator_token)
+        elif isinstance(node, UnaryOperatorNode):
+            node.operator = unary_operator(node.operator_token)
+
+        for child in iter_child_nodes(node):
+            self.visit(child, scope)
+
+    def resolve_function(self, node: FunctionDefinitionNode):
+        slot_index = {}
+        for arg_name_token in node.arg_name_tokens:
+            slot_index.setdefault(arg_name_token.value, len(slot_index))
+        for name in self.assigned_names(node.body_node):
+            slot_index.setdefault(name, len(slot_index))
+
+        node.slot_index = slot_index
+        self.names.local.update(slot_index)
+        for call_node in self.returned_calls(node.body_node):
+            call_node.tail_call = (slot_index, self.names.free)
+        self.visit(node.body_node, slot_index)
+
+    def assigned_names(self, node):
+        """Yields every name node stores into its own frame, skipping nested procedure bodies"""
+        if isinstance(node, (VariableAssignNode, ForNode)):
+            yield node.var_name_token.value
+        elif isinstance(node, FunctionDefinitionNode):
+            if node.var_name_token:
+                yield node.var_name_token.value
+            return
+
+        for child in iter_child_nodes(node):
+            yield from self.assigned_names(child)
+
+    def returned_calls(self, node):
+        """Yields the call of every RETURN f(...) in node, skipping loops and nested procedure bodies"""
+        if isinstance(node, ReturnNode):
+            if isinstance(node.node_to_return, CallNode):
+                yield node.node_to_return
+            return
+        if isinstance(
+            node,
+            (FunctionDefinitionNode, ForNode, WhileNode, RepeatUntilNode, RepeatNode),
+        ):
+            return
+
+        for child in iter_child_nodes(node):
+            yield from self.returned_calls(child)
+
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+from lexer.regex_lexer import RegexLexer
+from parser.parser import Parser
+from parser.nodes import clone_tree
+from compiler.optimizer import Optimizer
+
+
+# Changed whenever the lexer, parser or Optimizer could build a different tree
+# for the same text, so trees cached by an older version are never loaded
+TREE_VERSION = 2
+# Made next to a script run with RUN, like __pycache__
+CACHE_DIRECTORY = "__astcache__"
+# Turned off by benchmarks/run_cache.py to time parsing every time
+USE_DISK_CACHE = True
+# Trees of this many programs are kept in memory by each process
+MEMO_SIZE = 64
+
+# key -> optimized tree, never annotated, least recently used first
+memo = OrderedDict()
+memo_lock = threading.Lock()
+
+
+def parse_program(fn, text, short_circuit=True):
+    """Lexes, parses and optimizes a program and returns (node, error)"""
+    # Generate Tree, lexing the tokens as the parser gets to them
+    lexer = RegexLexer(fn, text)
+    tokens = lexer.generate_tokens()
+    parser = Parser(tokens, short_circuit)
+    # A lexing error anywhere in the text comes first, as if it was all lexed
+    # before parsing, even before the parser failing or crashing
+    try:
+        tree = parser.parse()
+    except Exception:
+        for _ in tokens:
+            pass
+        if lexer.error:
+            return None, lexer.error
+        raise
+    if tree.error:
+        for _ in tokens:
+            pass
+    if lexer.error:
+        return None, lexer.error
+    if tree.error:
+        return None, tree.error
+
+    return Optimizer().optimize(tree.node), None
+
+
+def cached_program(fn, text, short_circuit=True):
+    """
+    Like parse_program for the script in the file fn, but remembers the tree.
+    Trees are kept in memory and pickled into CACHE_DIRECTORY beside the
+    script, keyed by a hash of the text, so an edited script is parsed again.
+
+    The tree is the Optimizer's, before the Resolver annotates it. The memo
+    keeps it as it was and every call gets a clone_tree of it, since the
+    Resolver and the engines keep state in the nodes that mustn't be shared
+    by runs in different sessions. Programs with errors aren't cached.
+    """
+    key = program_key(fn, text, short_circuit)
+    with memo_lock:
+        node = memo.get(key)
+        if node is not None:
+            memo.move_to_end(key)
+    if node is not None:
+        return clone_tree(node), None
+
+    path = cache_path(fn)
+    data = load(path, key) if USE_DISK_CACHE else None
+    node = unpickle(data) if data is not None else None
+    if node is None:
+        node, error = parse_program(fn, text, short_circuit)
+        if error:
+            return None, error
+        if USE_DISK_CACHE:
+            try:
+                data = pickle.dumps(node, pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, RecursionError):
+                return node, None
+            save(path, key, data)
+
+    try:
+        copy = clone_tree(node)
+    except RecursionError:
+        return node, None
+    with memo_lock:
+        memo[key] = node
+        if len(memo) > MEMO_SIZE:
+            memo.popitem(last=False)
+    return copy, None
+
+
+def program_key(fn, text, short_circuit):
+    """Hex digest of everything the tree of a program depends on"""
+    header = f"{TREE_VERSION}\0{sys.implementation.cache_tag}\0{short_circuit}\0{fn}\0"
+    digest = hashlib.sha256(header.encode())
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def cache_path(fn):
+    directory, name = os.path.split(os.path.abspath(fn))
+    return os.path.join(directory, CACHE_DIRECTORY, name + ".pickle")
+
+
+def load(path, key):
+    """Returns the pickled tree cached at path for key, or None"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(key)) != key.encode():
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def unpickle(data):
+    """Returns the tree pickled in data, or None"""
+    try:
+        return pickle.loads(data)
+    except Exception:
+        # Half written or from an incompatible version
+        return None
+
+
+def save(path, key, data):
+    """Caches the pickled tree at path for key, or leaves things as they were"""
+    # Written aside and moved into place, so a process loading it at the same
+    # time sees either the old file or the whole new one
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            f.write(key.encode())
+            f.write(data)
+        os.replace(temporary_path, path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
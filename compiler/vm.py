@@ -0,0 +1,395 @@
+from values import *
+from interpreter import Function, BaseFunction, is_tail_call
+from utils.context import Context
+from utils.errors import RunTimeError
+from utils.results import RunTimeResult
+from compiler.bytecode import *
+from compiler.operators import operation_error
+
+
+EXHAUSTED = object()
+
+# How many procedure calls deep a stackless VirtualMachine lets a program go
+MAX_CALL_DEPTH = 20000
+
+
+class CompiledBody:
+    """The body_code of a procedure compiled to bytecode, run by the VM that made it"""
+
+    __slots__ = ("vm", "code")
+
+    def __init__(self, vm: "VirtualMachine", code: Code):
+        self.vm = vm
+        self.code = code
+
+    def __call__(self, context: Context) -> RunTimeResult:
+        return self.vm.run(self.code, context)
+
+
+class VirtualMachine:
+    """
+    Runs Code produced by the BytecodeCompiler with a value stack and a single
+    dispatch loop. Every value is produced by the same Value methods the tree
+    walker uses, so the results, errors and positions are the same.
+
+    run() follows the Interpreter.visit contract and returns a RunTimeResult,
+    which is also what compiled procedure bodies hand back to Function.execute.
+
+    A stackless VirtualMachine doesn't go through Function.execute for its own
+    procedures. A call saves the caller's frame on a list and the loop carries
+    on with the callee's code, so recursion is limited by max_depth instead of
+    Python's recursion limit, and going past it is a RunTimeError.
+    """
+
+    def __init__(self, stackless=False, max_depth=MAX_CALL_DEPTH):
+        self.stackless = stackless
+        self.max_depth = max_depth
+
+    def run(self, code: Code, context: Context) -> RunTimeResult:
+        instructions = code.instructions
+        symbol_table = context.symbol_table
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        # Saved (instructions, pc, stack, context, function, loop of the CALL) of
+        # each caller, and the procedure running now, when stackless
+        frames = []
+        function = None
+        step = context.budget.step
+
+        while True:
+            op, arg = instructions[pc]
+            pc += 1
+
+            if op == LOAD_NAME:
+                var_name, pos_start, pos_end = arg
+                value = symbol_table.get(var_name)
+                if value is None:
+                    return RunTimeResult().failure(
+                        RunTimeError(
+                            pos_start, pos_end, f"'{var_name}' is not defined", context
+                        )
+                    )
+                push(value)
+
+            elif op == LOAD_SLOT:
+                index, var_name, pos_start, pos_end = arg
+                value = symbol_table.slots[index]
+                if value is None and symbol_table.parent:
+                    value = symbol_table.parent.get(var_name)
+                if value is None:
+                    return RunTimeResult().failure(
+                        RunTimeError(
+                            pos_start, pos_end, f"'{var_name}' is not defined", context
+                        )
+                    )
+                push(value)
+
+            elif op == LOAD_CALLEE:
+                value = arg[0].get()
+                if value is None:
+                    cache, var_name, pos_start, pos_end, call_start, call_end = arg
+                    value = symbol_table.get(var_name)
+                    if value is None:
+                        return RunTimeResult().failure(
+                            RunTimeError(
+                                pos_start, pos_end, f"'{var_name}' is not defined", context
+                            )
+                        )
+                    if isinstance(value, BaseFunction):
+                        cache.fill(symbol_table, value.at_call(call_start, call_end))
+                push(value)
+
+            elif op == LOAD_CONST:
+                push(arg)
+
+            elif op == BINARY_OP:
+                operator, number_operation, left_node, right_node = arg
+                right = pop()
+                left = pop()
+                if (
+                    number_operation
+                    and type(left) is Number
+                    and type(right) is Number
+                    and not (number_operation[2] and right.value == 0)
+                ):
+                    push(
+                        number_operation[1](
+                            number_operation[0](left.value, right.value)
+                        )
+                    )
+                    continue
+                result, error = operator(left, right)
+                if error:
+                    return RunTimeResult().failure(
+                        operation_error(
+                            operator, context, (left, left_node), (right, right_node)
+                        )
+                    )
+                push(result)
+
+            elif op == SHORT_CIRCUIT:
+                target, short_circuit_on = arg
+                left = stack[-1]
+                if type(left) is Boolean and left.value == short_circuit_on:
+                    pc = target
+
+            elif op == STORE_SLOT:
+                symbol_table.slots[arg] = pop()
+
+            elif op == STORE_NAME:
+                symbol_table.set(arg, pop())
+
+            elif op == POP_JUMP_IF_FALSE:
+                if not pop().is_true():
+                    pc = arg
+
+            elif op == POP_JUMP_IF_TRUE:
+                if pop().is_true():
+                    pc = arg
+
+            elif op == JUMP:
+                pc = arg
+
+            elif op == STEP:
+                if step():
+                    return RunTimeResult().failure(
+                        context.budget.error(arg[0], arg[1], context)
+                    )
+
+            elif op == FOR_ITER:
+                item = next(stack[-1], EXHAUSTED)
+                if item is EXHAUSTED:
+                    pop()
+                    pc = arg
+                else:
+                    push(item)
+
+            elif op == POP_TOP:
+                pop()
+
+            elif op == DUP_TOP:
+                push(stack[-1])
+
+            elif op == CALL:
+                count, pos_start, pos_end, loop = arg
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                value_to_call = pop()
+
+                if self.stackless and type(
+                    getattr(value_to_call, "body_code", None)
+                ) is CompiledBody:
+                    if len(args) != len(value_to_call.arg_names):
+                        return value_to_call.check_args(
+                            value_to_call.arg_names, args, context, pos_start, pos_end
+                        )
+                    if step():
+                        return RunTimeResult().failure(
+                            context.budget.error(pos_start, pos_end, context)
+                        )
+                    if len(frames) >= self.max_depth:
+                        return RunTimeResult().failure(
+                            RunTimeError(
+                                pos_start,
+                                pos_end,
+                                f"Maximum recursion depth of {self.max_depth} exceeded",
+                                context,
+                            )
+                        )
+
+                    exec_context = value_to_call.generate_new_context(
+                        context, pos_start, value_to_call.slot_index
+                    )
+                    value_to_call.populate_args(
+                        value_to_call.arg_names, args, exec_context
+                    )
+                    frames.append((instructions, pc, stack, context, function, loop))
+                    function = value_to_call
+                    instructions = function.body_code.code.instructions
+                    pc = 0
+                    stack = []
+                    push = stack.append
+                    pop = stack.pop
+                    context = exec_context
+                    symbol_table = context.symbol_table
+                    continue
+
+                result = value_to_call.execute(args, context, pos_start, pos_end)
+                if result.should_return():
+                    if (
+                        loop
+                        and not result.error
+                        and (result.loop_should_break or result.loop_should_continue)
+                    ):
+                        break_target, continue_target, depth = loop
+                        del stack[depth:]
+                        pc = break_target if result.loop_should_break else continue_target
+                        continue
+                    return result
+
+                push(result.value)
+
+            elif op == TAIL_CALL:
+                count, pos_start, pos_end, tail_call = arg
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                value_to_call = pop()
+
+                if is_tail_call(tail_call, value_to_call, args):
+                    if step():
+                        return RunTimeResult().failure(
+                            context.budget.error(pos_start, pos_end, context)
+                        )
+                    if not (
+                        frames
+                        and self.stackless
+                        and type(value_to_call.body_code) is CompiledBody
+                    ):
+                        return RunTimeResult().success_tail_call(value_to_call, args)
+
+                    # Runs the callee in place of the current procedure's frame
+                    caller_context = context.parent
+                    entry_pos = context.parent_entry_pos
+                    tail_calls = context.tail_calls + 1
+                    function.frames.release(context)
+                    context = value_to_call.generate_new_context(
+                        caller_context, entry_pos, value_to_call.slot_index
+                    )
+                    context.tail_calls = tail_calls
+                    value_to_call.populate_args(value_to_call.arg_names, args, context)
+                    function = value_to_call
+                    instructions = function.body_code.code.instructions
+                    pc = 0
+                    del stack[:]
+                    symbol_table = context.symbol_table
+                    continue
+
+                result = value_to_call.execute(args, context, pos_start, pos_end)
+                if result.should_return():
+                    return result
+                push(result.value)
+
+            elif op == LOAD_NULL:
+                push(Number.null)
+
+            elif op == UNARY_OP:
+                operator, operand_node = arg
+                operand = pop()
+                result, error = operator(operand)
+                if error:
+                    return RunTimeResult().failure(
+                        operation_error(operator, context, (operand, operand_node))
+                    )
+                push(result)
+
+            elif op == BUILD_LIST:
+                if arg:
+                    elements = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    elements = []
+                push(List(elements))
+
+            elif op == GET_ITER:
+                iterable = pop()
+                if not isinstance(iterable, List):
+                    return RunTimeResult().failure(
+                        RunTimeError(
+                            arg[0],
+                            arg[1],
+                            "For loop can only iterate over a list",
+                            context,
+                        )
+                    )
+                push(iterable.iterate())
+
+            elif op == GET_REPEAT_ITER:
+                count = pop().value if arg is None else arg
+                push(iter(range(count)))
+
+            elif op == JUMP_CLEAR:
+                pc, depth = arg
+                del stack[depth:]
+
+            elif op == NEW_ACCUMULATOR:
+                push([])
+
+            elif op == ACCUMULATE:
+                stack[arg].append(pop())
+
+            elif op == BUILD_ACCUMULATED:
+                push(List(pop()))
+
+            elif op == MAKE_FUNCTION:
+                (
+                    func_name,
+                    func_code,
+                    arg_names,
+                    should_auto_return,
+                    body_node,
+                    slot_index,
+                ) = arg
+                func_value = Function(
+                    func_name,
+                    body_node,
+                    arg_names,
+                    should_auto_return,
+                    body_code=CompiledBody(self, func_code),
+                    slot_index=slot_index,
+                )
+                if func_name:
+                    symbol_table.set(func_name, func_value)
+                push(func_value)
+
+            elif (
+                op == RETURN_VALUE
+                or op == RETURN_RESULT
+                or op == BREAK_OUT
+                or op == CONTINUE_OUT
+            ):
+                if op == RETURN_VALUE:
+                    result = RunTimeResult().success_return(pop())
+                elif op == RETURN_RESULT:
+                    result = RunTimeResult().success(pop())
+                elif op == BREAK_OUT:
+                    result = RunTimeResult().success_break()
+                else:
+                    result = RunTimeResult().success_continue()
+
+                # Returns to the saved caller, the way Function.execute and CALL would
+                while frames:
+                    callee = function
+                    callee.frames.release(context)
+                    instructions, pc, stack, context, function, loop = frames.pop()
+                    push = stack.append
+                    pop = stack.pop
+                    symbol_table = context.symbol_table
+
+                    if result.loop_should_break or result.loop_should_continue:
+                        if loop:
+                            break_target, continue_target, depth = loop
+                            del stack[depth:]
+                            pc = break_target if result.loop_should_break else continue_target
+                            break
+                        # The caller ends with the same BREAK or CONTINUE
+                        continue
+
+                    push(
+                        (result.value if callee.should_auto_return else None)
+                        or result.func_return_value
+                        or Number.null
+                    )
+                    break
+                else:
+                    return result
+
+            else:
+                raise Exception(f"Unknown opcode {op}")
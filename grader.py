@@ -0,0 +1,183 @@
+"""
+Runs a batch of programs across a pool of worker processes and writes one JSON
+line per program, in order, with what it DISPLAYed, its value, its error and the
+steps it took.
+
+    python grader.py submissions/              # every .txt file in a directory
+    python grader.py manifest.jsonl            # the programs a manifest lists
+    python grader.py submissions/ --workers 8 --mode closure -o results.jsonl
+    python grader.py submissions/ --max-steps 1000000 --timeout 5
+
+In a directory, the text in name.in is the stdin INPUT reads for name.txt, if
+there is one. A manifest has a JSON object per line, like
+
+    {"program": "alice.txt", "stdin": "3\\n4\\n"}
+    {"program": "bob.txt", "stdin_file": "fixtures/two_numbers.in"}
+
+with paths relative to the manifest.
+
+Every program stops with a RunTimeError after MAX_STEPS loop bodies and calls
+or TIMEOUT seconds, so one that never ends can't hold up the rest. Pass 0 for
+no limit.
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from interpreter import Session
+
+
+MODES = ("tree", "closure", "bytecode", "stackless")
+STDIN_EXTENSION = ".in"
+# Limits of each program by default
+MAX_STEPS = 10_000_000
+TIMEOUT = 10.0
+
+
+def find_programs(path):
+    """Returns a (program path, stdin path or None, stdin text or None) per program"""
+    if os.path.isdir(path):
+        jobs = []
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(".txt"):
+                continue
+            stdin_path = os.path.join(path, name[: -len(".txt")] + STDIN_EXTENSION)
+            jobs.append(
+                (
+                    os.path.join(path, name),
+                    stdin_path if os.path.isfile(stdin_path) else None,
+                    None,
+                )
+            )
+        return jobs
+
+    directory = os.path.dirname(path)
+    jobs = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            stdin_file = entry.get("stdin_file")
+            jobs.append(
+                (
+                    os.path.join(directory, entry["program"]),
+                    os.path.join(directory, stdin_file) if stdin_file else None,
+                    entry.get("stdin"),
+                )
+            )
+    return jobs
+
+
+def warm_up(mode):
+    """Runs once in each worker, so the engine is imported before the first program"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        Session().run("<warm up>", "PROCEDURE f(x) { RETURN x }\nf(1)", mode=mode)
+
+
+def grade(job, mode="tree", max_steps=MAX_STEPS, timeout=TIMEOUT):
+    """Runs one program with its stdin and returns its JSON result"""
+    fn, stdin_path, stdin = job
+    result = {"program": fn, "output": "", "value": None, "error": None, "steps": 0}
+    start = time.perf_counter()
+    try:
+        with open(fn, "r") as f:
+            source = f.read()
+        if stdin_path is not None:
+            with open(stdin_path, "r") as f:
+                stdin = f.read()
+    except OSError as e:
+        result["error"] = f"Failed to load {e.filename}: {e.strerror}"
+        result["seconds"] = 0.0
+        return json.dumps(result)
+
+    session = Session()
+    stdout = io.StringIO()
+    real_stdin = sys.stdin
+    sys.stdin = io.StringIO(stdin or "")
+    try:
+        with contextlib.redirect_stdout(stdout):
+            value, error = session.run(
+                fn, source, mode=mode, max_steps=max_steps, timeout=timeout
+            )
+        result["value"] = None if value is None else repr(value)
+        result["error"] = error.as_string() if error else None
+    except Exception as e:
+        # Like INPUT with nothing left to read, or a crash in the interpreter
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        sys.stdin = real_stdin
+
+    if session.budget:
+        result["steps"] = session.budget.steps
+    result["output"] = stdout.getvalue()
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return json.dumps(result)
+
+
+def grade_all(jobs, mode="tree", workers=None, max_steps=MAX_STEPS, timeout=TIMEOUT):
+    """Yields the JSON result of every job in order, grading them in parallel"""
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker, so each one pickles a batch of jobs at a time
+    # without a slow chunk leaving the other workers idle at the end
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=warm_up, initargs=(mode,)) as pool:
+        grade_job = functools.partial(
+            grade, mode=mode, max_steps=max_steps, timeout=timeout
+        )
+        yield from pool.map(grade_job, jobs, chunksize=chunksize)
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        description="Grade a directory or manifest of programs in parallel"
+    )
+    arg_parser.add_argument("path", help="directory of .txt programs or a manifest")
+    arg_parser.add_argument("--mode", choices=MODES, default="tree")
+    arg_parser.add_argument("--workers", type=int, help="default: one per core")
+    arg_parser.add_argument(
+        "--max-steps",
+        type=int,
+        default=MAX_STEPS,
+        help=f"loop bodies and calls per program, default: {MAX_STEPS}",
+    )
+    arg_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=TIMEOUT,
+        help=f"seconds per program, default: {TIMEOUT}",
+    )
+    arg_parser.add_argument("-o", "--output", help="default: stdout")
+    args = arg_parser.parse_args(argv)
+
+    jobs = find_programs(args.path)
+    start = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        results = grade_all(
+            jobs, args.mode, args.workers, args.max_steps or None, args.timeout or None
+        )
+        for line in results:
+            out.write(line + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(jobs)} programs in {elapsed:.2f}s, "
+        f"{len(jobs) / elapsed if elapsed else 0:.1f} programs/s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
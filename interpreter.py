@@ -3,46 +3,61 @@ import random
 import time
 
 from values import *
-from utils.context import Context, SymbolTable
-from utils.results import RunTimeResult
+from utils.context import Context, SymbolTable, FrozenSymbolTable, FramePool
+from utils.results import (
+    RunTimeResult,
+    ReturnSignal,
+    TailCallSignal,
+    BreakSignal,
+    ContinueSignal,
+    ErrorSignal,
+)
 from utils.errors import RunTimeError
+from utils.budget import StepBudget
 from lexer.tokens import *
 from parser.nodes import *
-from lexer.lexer import Lexer
-from parser.parser import Parser
+from compiler.operators import operation_error
+from compiler.resolver import Resolver, ProcedureNames
+from compiler.tree_cache import parse_program, cached_program
 
 from robot.robot import Robot
 
 
 class BaseFunction(Value):
+    # Contexts of calls that have returned, shared by every function
+    frames = FramePool()
+
     def __init__(self, name):
         super().__init__()
         self.name = name or "<anonymous>"  # TODO: prob change this to no anonymous
 
-    def generate_new_context(self):
-        new_context = Context(self.name, self.context, self.pos_start)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
-        return new_context
+    def at_call(self, pos_start, pos_end):
+        """Returns what a CalleeCache keeps for the call at pos_start..pos_end"""
+        return self
+
+    def generate_new_context(self, context: Context, pos_start, slot_index=None):
+        """Makes the context for a call from context at pos_start"""
+        return self.frames.acquire(self.name, context, pos_start, slot_index)
 
-    def check_args(self, arg_names, args):
+    def check_args(self, arg_names, args, context, pos_start, pos_end):
         RTresult = RunTimeResult()
 
         if len(args) > len(arg_names):
             return RTresult.failure(
                 RunTimeError(
-                    self.pos_start,
-                    self.pos_end,
+                    pos_start,
+                    pos_end,
                     f"{len(args) - len(arg_names)} too many arguments passed into '{self.name}'",
-                    self.context,
+                    context,
                 )
             )
         elif len(args) < len(arg_names):
             return RTresult.failure(
                 RunTimeError(
-                    self.pos_start,
-                    self.pos_end,
+                    pos_start,
+                    pos_end,
                     f"{len(arg_names) - len(args)} too few arguments passed into '{self.name}'",
-                    self.context,
+                    context,
                 )
             )
 
@@ -53,12 +68,13 @@ class BaseFunction(Value):
         for i in range(len(args)):
             arg_name = arg_names[i]
             arg_value: Value = args[i]
-            arg_value.set_context(exec_context)
             exec_context.symbol_table.set(arg_name, arg_value)
 
-    def check_and_populate_args(self, arg_names, args, exec_context):
+    def check_and_populate_args(self, arg_names, args, exec_context, pos_start, pos_end):
         RTresult = RunTimeResult()
-        RTresult.register(self.check_args(arg_names, args))
+        RTresult.register(
+            self.check_args(arg_names, args, exec_context.parent, pos_start, pos_end)
+        )
         if RTresult.should_return():
             return RTresult
         self.populate_args(arg_names, args, exec_context)
@@ -66,29 +82,74 @@ class BaseFunction(Value):
 
 
 class Function(BaseFunction):
-    def __init__(self, name, body_node, arg_names, should_auto_return):
+    def __init__(
+        self,
+        name,
+        body_node,
+        arg_names,
+        should_auto_return,
+        body_code=None,
+        slot_index=None,
+    ):
         super().__init__(name)
         self.arg_names = arg_names
         self.body_node = body_node
         self.should_auto_return = should_auto_return
+        # Compiled replacement for visiting body_node, set by the compiled execution modes
+        self.body_code = body_code
+        self.slot_index = slot_index
 
-    def execute(self, args):
-        RTresult = RunTimeResult()
-        interpreter = Interpreter()
-        exec_context = self.generate_new_context()
+    def execute(self, args, context, pos_start, pos_end):
+        """Calls the procedure from context, with the call written at pos_start..pos_end"""
+        if len(args) != len(self.arg_names):
+            return self.check_args(self.arg_names, args, context, pos_start, pos_end)
 
-        RTresult.register(
-            self.check_and_populate_args(self.arg_names, args, exec_context)
-        )
-        if RTresult.should_return():
-            return RTresult
+        budget = context.budget
+        if budget.step():
+            return RunTimeResult().failure(budget.error(pos_start, pos_end, context))
 
-        value = RTresult.register(interpreter.visit(self.body_node, exec_context))
-        if RTresult.should_return() and RTresult.func_return_value is None:
+        function = self
+        exec_context = self.generate_new_context(context, pos_start, self.slot_index)
+        self.populate_args(self.arg_names, args, exec_context)
+
+        while True:
+            try:
+                if function.body_code:
+                    RTresult = function.body_code(exec_context)
+                else:
+                    RTresult = Interpreter.shared.visit(function.body_node, exec_context)
+            except RecursionError:
+                # Out of Python stack, deep in recursion. The call that ran out
+                # fails like the stackless VM's calls past max_depth, or if even
+                # that takes too much stack, one of its callers does.
+                return RunTimeResult().failure(
+                    RunTimeError(
+                        pos_start, pos_end, "Maximum recursion depth exceeded", context
+                    )
+                )
+            if RTresult.error:
+                return RTresult
+            if RTresult.tail_call is None:
+                break
+
+            # The body ended with RETURN f(...), so f runs in place of this call
+            function, args = RTresult.tail_call
+            tail_calls = exec_context.tail_calls + 1
+            self.frames.release(exec_context)
+            exec_context = function.generate_new_context(
+                context, pos_start, function.slot_index
+            )
+            exec_context.tail_calls = tail_calls
+            function.populate_args(function.arg_names, args, exec_context)
+
+        self.frames.release(exec_context)
+        if RTresult.func_return_value is None and (
+            RTresult.loop_should_continue or RTresult.loop_should_break
+        ):
             return RTresult
 
         return_value = (
-            (value if self.should_auto_return else None)
+            (RTresult.value if function.should_auto_return else None)
             or RTresult.func_return_value
             or Number.null
         )
@@ -96,7 +157,12 @@ class Function(BaseFunction):
 
     def copy(self):
         copy = Function(
-            self.name, self.body_node, self.arg_names, self.should_auto_return
+            self.name,
+            self.body_node,
+            self.arg_names,
+            self.should_auto_return,
+            self.body_code,
+            self.slot_index,
         )
         copy.set_context(self.context)
         copy.set_pos(self.pos_start, self.pos_end)
@@ -106,31 +172,70 @@ class Function(BaseFunction):
         return f"<function {self.name}>"
 
 
+def is_tail_call(tail_call, value_to_call, args):
+    """Whether a call the Resolver gave tail_call can run value_to_call in place of its procedure"""
+    return (
+        type(value_to_call) is Function
+        and len(args) == len(value_to_call.arg_names)
+        and tail_call[1].isdisjoint(tail_call[0])
+    )
+
+
 class BuiltInFunction(BaseFunction):
+    """
+    A procedure written in Python. A call_<name>(self, context, *args) method
+    gets the arguments positionally, along with the caller's context, and
+    reports errors with self.error. Extension builtins can instead define an
+    execute_<name>(self, exec_context) method with an arg_names list, which
+    reads the arguments from the symbol table of a frame made for the call.
+    """
+
     def __init__(self, name):
         super().__init__(name)
+        self.call = getattr(self, f"call_{self.name}", None)
+        if self.call is not None:
+            code = self.call.__code__
+            self.arg_names = code.co_varnames[2 : code.co_argcount]
+            self.method = None
+        else:
+            self.method = getattr(self, f"execute_{self.name}", self.no_visit_method)
+            self.arg_names = getattr(self.method, "arg_names", [])
 
-    def execute(self, args):
-        RTresult = RunTimeResult()
-        exec_context = self.generate_new_context()
-
-        method_name = f"execute_{self.name}"
-        method = getattr(self, method_name, self.no_visit_method)
+    def execute(self, args, context, pos_start, pos_end):
+        if len(args) != len(self.arg_names):
+            return self.check_args(self.arg_names, args, context, pos_start, pos_end)
 
-        RTresult.register(
-            self.check_and_populate_args(method.arg_names, args, exec_context)
-        )
-        if RTresult.should_return():
-            return RTresult
+        # Builtins report errors at their own position, so they run on a copy
+        # placed at the call, unless this already is one
+        if self.pos_start is pos_start:
+            function = self
+        else:
+            function = self.located(pos_start, pos_end, context)
+        if function.call is not None:
+            return function.call(context, *args)
 
-        return_value = RTresult.register(method(exec_context))
+        RTresult = RunTimeResult()
+        exec_context = function.generate_new_context(context, pos_start)
+        function.populate_args(self.arg_names, args, exec_context)
+        return_value = RTresult.register(function.method(exec_context))
         if RTresult.should_return():
             return RTresult
+        self.frames.release(exec_context)
         return RTresult.success(return_value)
 
+    def error(self, context, message):
+        """Fails the call from context, in a frame of its own like an execute_* method's errors"""
+        exec_context = self.generate_new_context(context, self.pos_start)
+        return RunTimeResult().failure(
+            RunTimeError(self.pos_start, self.pos_end, message, exec_context)
+        )
+
     def no_visit_method(self, node, context):
         raise Exception(f"No execute_{self.name} method defined")
 
+    def at_call(self, pos_start, pos_end):
+        return self.located(pos_start, pos_end, None)
+
     def copy(self):
         copy = BuiltInFunction(self.name)
         copy.set_context(self.context)
@@ -140,17 +245,13 @@ class BuiltInFunction(BaseFunction):
     def __repr__(self):
         return f"<built-in function {self.name}>"
 
-    ####### Execute method for all functions #######
+    ####### Call method for all functions #######
 
-    def execute_display(self, exec_context):
-        print(str(exec_context.symbol_table.get("value")))
+    def call_display(self, context, value):
+        print(str(value))
         return RunTimeResult().success(Number.null)
 
-    execute_display.arg_names = ["value"]
-
-    def execute_input(
-        self, exec_context
-    ):  # TODO: Maybe make this fancier with string argument?
+    def call_input(self, context):  # TODO: Maybe make this fancier with string argument?
         text = input()
         txt = text.strip()
         if txt == "":
@@ -159,157 +260,69 @@ class BuiltInFunction(BaseFunction):
         try:
             fval = float(txt)
             if fval.is_integer():
-                return RunTimeResult().success(Number(int(fval)))
-            return RunTimeResult().success(Number(fval))
+                return RunTimeResult().success(Number.of(int(fval)))
+            return RunTimeResult().success(Number.of(fval))
         except Exception:
             return RunTimeResult().success(String(text))
 
-    execute_input.arg_names = []
-
-    def execute_random(self, exec_context):
-        min_value = exec_context.symbol_table.get("min_value")
-        max_value = exec_context.symbol_table.get("max_value")
-
+    def call_random(self, context, min_value, max_value):
         if not isinstance(min_value, Number):
-            return RunTimeResult().failure(
-                RunTimeError(
-                    self.pos_start,
-                    self.pos_end,
-                    "First argument must be an integer",
-                    exec_context,
-                )
-            )
+            return self.error(context, "First argument must be an integer")
         if not isinstance(max_value, Number):
-            return RunTimeResult().failure(
-                RunTimeError(
-                    self.pos_start,
-                    self.pos_end,
-                    "Second argument must be an integer",
-                    exec_context,
-                )
-            )
+            return self.error(context, "Second argument must be an integer")
 
         random_value = random.randint(min_value.value, max_value.value)
-        return RunTimeResult().success(Number(random_value))
+        return RunTimeResult().success(Number.of(random_value))
 
-    execute_random.arg_names = ["min_value", "max_value"]
-
-    def execute_clear(self, exec_context):
+    def call_clear(self, context):
         os.system("cls" if os.name == "nt" else "clear")
         return RunTimeResult().success(Number.null)
 
-    execute_clear.arg_names = []
-
-    def execute_append(self, exec_context: Context):
-        list_ = exec_context.symbol_table.get("list")
-        value_ = exec_context.symbol_table.get("value")
-
+    def call_append(self, context, list_, value):
         if not isinstance(list_, List):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "First argument must be a list",
-                    exec_context,
-                )
-            )
+            # TODO: Change to syntax error maybe?
+            return self.error(context, "First argument must be a list")
 
-        list_.elements.append(value_)  # TODO: Maybe add error check for value_ too?
+        list_.append(value)  # TODO: Maybe add error check for value_ too?
         return RunTimeResult().success(Number.null)
 
-    execute_append.arg_names = ["list", "value"]
-
-    def execute_insert(self, exec_context):
-        list_ = exec_context.symbol_table.get("list")
-        index = exec_context.symbol_table.get("index")
-        value = exec_context.symbol_table.get("value")
-
+    def call_insert(self, context, list_, index, value):
         if not isinstance(list_, List):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "First argument must be a list",
-                    exec_context,
-                )
-            )
-
+            return self.error(context, "First argument must be a list")
         if not isinstance(index, Number):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "Second argument must be an integer",
-                    exec_context,
-                )
-            )
+            return self.error(context, "Second argument must be an integer")
 
-        list_.elements.insert(index.value, value)
+        list_.insert(index.value, value)
         return RunTimeResult().success(Number.null)
 
-    execute_insert.arg_names = ["list", "index", "value"]
-
-    def execute_remove(self, exec_context):
-        list_ = exec_context.symbol_table.get("list")
-        index = exec_context.symbol_table.get("index")
-
+    def call_remove(self, context, list_, index):
         if not isinstance(list_, List):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "First argument must be a list",
-                    exec_context,
-                )
-            )
-
+            return self.error(context, "First argument must be a list")
         if not isinstance(index, Number):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "Second argument must be an integer",
-                    exec_context,
-                )
-            )
+            return self.error(context, "Second argument must be an integer")
 
         try:
-            element = list_.elements.pop(index.value)
+            element = list_.pop(index.value)
         except:  # TODO: Add type of error here
-            return RunTimeResult().failure(
-                RunTimeError(
-                    self.pos_start,
-                    self.pos_end,
-                    "Element at this index couldn't be removed because index is out of bounds",
-                    exec_context,
-                )
+            return self.error(
+                context,
+                "Element at this index couldn't be removed because index is out of bounds",
             )
         return RunTimeResult().success(element)
 
-    execute_remove.arg_names = ["list", "index"]
-
-    def execute_length(self, exec_context: Context):
-        list_ = exec_context.symbol_table.get("list")
-
+    def call_length(self, context, list_):
         if not isinstance(list_, List):
-            return RunTimeResult().failure(
-                RunTimeError(  # TODO: Change to syntax error maybe?
-                    self.pos_start,
-                    self.pos_end,
-                    "Argument must be a list",
-                    exec_context,
-                )
-            )
+            return self.error(context, "Argument must be a list")
 
-        return RunTimeResult().success(Number(len(list_.elements)))
+        return RunTimeResult().success(Number.of(list_.size))
 
-    execute_length.arg_names = ["list"]
+    ####### Execute method for all functions #######
 
     def execute_create_grid(
         self, exec_context: Context
     ):  # TODO: This sucks make it better
         RTresult = RunTimeResult()
-        robot: Robot = global_symbol_table.get(100)
+        robot: Robot = exec_context.symbol_table.get(SESSION_KEY).robot
 
         RTresult.register(robot.create_grid())
         if RTresult.error:
@@ -323,7 +336,7 @@ class BuiltInFunction(BaseFunction):
 
     def execute_move_forward(self, exec_context: Context):
         RTresult = RunTimeResult()
-        robot: Robot = global_symbol_table.get(100)
+        robot: Robot = exec_context.symbol_table.get(SESSION_KEY).robot
 
         time.sleep(2)
         RTresult.register(robot.move_forward())
@@ -338,7 +351,7 @@ class BuiltInFunction(BaseFunction):
 
     def execute_rotate_left(self, exec_context: Context):
         RTresult = RunTimeResult()
-        robot: Robot = global_symbol_table.get(100)
+        robot: Robot = exec_context.symbol_table.get(SESSION_KEY).robot
 
         time.sleep(2)
         RTresult.register(robot.rotate_left())
@@ -354,7 +367,7 @@ class BuiltInFunction(BaseFunction):
 
     def execute_rotate_right(self, exec_context: Context):
         RTresult = RunTimeResult()
-        robot: Robot = global_symbol_table.get(100)
+        robot: Robot = exec_context.symbol_table.get(SESSION_KEY).robot
 
         time.sleep(2)
         RTresult.register(robot.rotate_right())
@@ -375,7 +388,7 @@ class BuiltInFunction(BaseFunction):
             _direction = String(_direction)
 
         RTresult = RunTimeResult()
-        robot: Robot = global_symbol_table.get(100)
+        robot: Robot = exec_context.symbol_table.get(SESSION_KEY).robot
 
         if not isinstance(_direction, String) or _direction.value not in [
             "FORWARD",
@@ -428,7 +441,18 @@ class BuiltInFunction(BaseFunction):
                 )
             )
 
-        _, error = run(fn, script)
+        # In the session of the program calling RUN, with its settings and
+        # counting steps in its budget
+        session: Session = exec_context.symbol_table.get(SESSION_KEY)
+        _, error = session.run(
+            fn,
+            script,
+            session.mode,
+            session.short_circuit,
+            session.max_depth,
+            cache=True,
+            budget=exec_context.budget,
+        )
 
         if error:
             return RunTimeResult().failure(
@@ -463,43 +487,49 @@ BuiltInFunction.run = BuiltInFunction("run")
 
 # TODO: Make static class, hard challenge
 class Interpreter:
+    """
+    Walks the AST. The evaluate_* methods return a Value directly and raise the
+    signals from utils.results for RETURN, BREAK, CONTINUE and errors, so the
+    common path doesn't build a RunTimeResult per node. visit() is the boundary
+    that turns a signal back into a RunTimeResult for Function.execute and run().
+    """
+
+    # evaluate_* method for each node type, filled in as node types are first seen
+    methods = {}
+
     def visit(self, node, context: Context) -> RunTimeResult:
         """Process the node and visit all the child nodes"""
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name, self.no_visit_method)
-        return method(node, context)
-
-    def no_visit_method(self, node, context: Context):
-        raise Exception(f"No visit_{type(node).__name__}")
-
-    def visit_NumberNode(self, node: NumberNode, context: Context):
-        return RunTimeResult().success(
-            Number(node.token.value)
-            .set_context(context)
-            .set_pos(node.token.pos_start, node.token.pos_end)
-        )
+        return RunTimeResult.capture(self.evaluate, node, context)
 
-    def visit_BooleanNode(self, node: BooleanNode, context: Context):
-        return RunTimeResult().success(
-            Boolean(node.token.value)
-            .set_context(context)
-            .set_pos(node.token.pos_start, node.token.pos_end)
-        )
+    def evaluate(self, node, context: Context) -> Value:
+        method = Interpreter.methods.get(type(node))
+        if method is None:
+            method_name = f"evaluate_{type(node).__name__}"
+            method = getattr(Interpreter, method_name, Interpreter.no_evaluate_method)
+            Interpreter.methods[type(node)] = method
+        return method(self, node, context)
 
-    def visit_StringNode(self, node: StringNode, context: Context):
-        return RunTimeResult().success(
-            String(node.token.value)
-            .set_context(context)
-            .set_pos(node.token.pos_start, node.token.pos_end)
-        )
+    def no_evaluate_method(self, node, context: Context):
+        raise Exception(f"No evaluate_{type(node).__name__}")
 
-    def visit_VariableAccessNode(self, node: VariableAccessNode, context: Context):
-        RTresult = RunTimeResult()
+    def evaluate_NumberNode(self, node: NumberNode, context: Context):
+        return Number.of(node.token.value)
+
+    def evaluate_BooleanNode(self, node: BooleanNode, context: Context):
+        return Boolean.of(node.token.value)
+
+    def evaluate_StringNode(self, node: StringNode, context: Context):
+        return String(node.token.value)
+
+    def evaluate_VariableAccessNode(self, node: VariableAccessNode, context: Context):
         var_name = node.var_name_token.value
-        value = context.symbol_table.get(var_name)
+        if node.slot:
+            value = context.symbol_table.get_slot(node.slot, var_name)
+        else:
+            value = context.symbol_table.get(var_name)
 
         if not value:
-            return RTresult.failure(
+            raise ErrorSignal(
                 RunTimeError(
                     node.pos_start,
                     node.pos_end,
@@ -508,129 +538,96 @@ class Interpreter:
                 )
             )
 
-        value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-        return RTresult.success(value)
+        return value
 
-    def visit_VariableAssignNode(self, node: VariableAssignNode, context: Context):
-        RTresult = RunTimeResult()
+    def evaluate_VariableAssignNode(self, node: VariableAssignNode, context: Context):
         var_name = node.var_name_token.value
-        value = RTresult.register(self.visit(node.value_node, context))
-        if RTresult.should_return():
-            return RTresult
+        value = self.evaluate(node.value_node, context)
 
-        context.symbol_table.set(var_name, value)
-        return RTresult.success(value)
+        if node.slot:
+            context.symbol_table.set_slot(node.slot, value)
+        else:
+            context.symbol_table.set(var_name, value)
+        return value
+
+    def evaluate_ListNode(self, node: ListNode, context: Context):
+        if not node.value_used:
+            for element_node in node.element_nodes:
+                self.evaluate(element_node, context)
+            return Number.null
 
-    def visit_ListNode(self, node: ListNode, context: Context):
-        RTresult = RunTimeResult()
         elements = []
 
         for element_node in node.element_nodes:
-            elements.append(RTresult.register(self.visit(element_node, context)))
-            if RTresult.should_return():
-                return RTresult
+            elements.append(self.evaluate(element_node, context))
 
-        return RTresult.success(
-            List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
-        )
-
-    def visit_BinaryOperatorNode(self, node: BinaryOperatorNode, context: Context):
-        RTresult = RunTimeResult()
-        left: Number = RTresult.register(self.visit(node.left_node, context))
-        if RTresult.should_return():
-            return RTresult
-        right: Number = RTresult.register(self.visit(node.right_node, context))
-        if RTresult.should_return():
-            return RTresult
-
-        if node.operator_token.type == TYPE_PLUS:
-            result, error = left.added_to(right)
-        elif node.operator_token.type == TYPE_MINUS:
-            result, error = left.subract_by(right)
-        elif node.operator_token.type == TYPE_MUL:
-            result, error = left.multiply_by(right)
-        elif node.operator_token.type == TYPE_DIV:
-            result, error = left.divide_by(right)
-        elif node.operator_token.matches(TYPE_KEYWORD, "MOD"):
-            result, error = left.mod_by(right)
-        elif node.operator_token.type == TYPE_POW:
-            result, error = left.power_by(right)
-        elif node.operator_token.type == TYPE_EE:
-            result, error = left.get_comparison_eq(right)
-        elif node.operator_token.type == TYPE_NE:
-            result, error = left.get_comparison_ne(right)
-        elif node.operator_token.type == TYPE_LT:
-            result, error = left.get_comparison_lt(right)
-        elif node.operator_token.type == TYPE_GT:
-            result, error = left.get_comparison_gt(right)
-        elif node.operator_token.type == TYPE_LTE:
-            result, error = left.get_comparison_lte(right)
-        elif node.operator_token.type == TYPE_GTE:
-            result, error = left.get_comparison_gte(right)
-        elif node.operator_token.matches(TYPE_KEYWORD, "AND"):
-            result, error = left.and_by(right)
-        elif node.operator_token.matches(TYPE_KEYWORD, "OR"):
-            result, error = left.or_by(right)
+        return List(elements)
 
+    def evaluate_BinaryOperatorNode(self, node: BinaryOperatorNode, context: Context):
+        left: Number = self.evaluate(node.left_node, context)
+        if (
+            node.short_circuit_on is not None
+            and type(left) is Boolean
+            and left.value == node.short_circuit_on
+        ):
+            return left
+        right: Number = self.evaluate(node.right_node, context)
+
+        number_operation = node.number_operation
+        if (
+            number_operation
+            and type(left) is Number
+            and type(right) is Number
+            and not (number_operation[2] and right.value == 0)
+        ):
+            return number_operation[1](number_operation[0](left.value, right.value))
+        result, error = node.operator(left, right)
         if error:
-            return RTresult.failure(error)
-        else:
-            return RTresult.success(result.set_pos(node.pos_start, node.pos_end))
-
-    def visit_UnaryOperatorNode(self, node: UnaryOperatorNode, context: Context):
-        RTresult = RunTimeResult()
-        number = RTresult.register(self.visit(node.node, context))
-        if RTresult.should_return():
-            return RTresult
-
-        error = None
+            raise ErrorSignal(
+                operation_error(
+                    node.operator,
+                    context,
+                    (left, node.left_node),
+                    (right, node.right_node),
+                )
+            )
+        return result
 
-        if node.operator_token.type == TYPE_MINUS:
-            number, error = number.multiply_by(Number(-1))
-        elif node.operator_token.matches(TYPE_KEYWORD, "NOT"):
-            number, error = number.notted()
+    def evaluate_UnaryOperatorNode(self, node: UnaryOperatorNode, context: Context):
+        operand = self.evaluate(node.node, context)
+        if not node.operator:
+            return operand
 
+        result, error = node.operator(operand)
         if error:
-            return RTresult.failure(error)
-        else:
-            return RTresult.success(number.set_pos(node.pos_start, node.pos_end))
-
-    def visit_IfNode(self, node: IfNode, context: Context):
-        RTresult = RunTimeResult()
+            raise ErrorSignal(
+                operation_error(node.operator, context, (operand, node.node))
+            )
+        return result
 
+    def evaluate_IfNode(self, node: IfNode, context: Context):
         for condition, expr, should_return_null in node.cases:
-            condition_value = RTresult.register(self.visit(condition, context))
-            if RTresult.should_return():
-                return RTresult
+            condition_value = self.evaluate(condition, context)
 
             if condition_value.is_true():
-                expr_value = RTresult.register(self.visit(expr, context))
-                if RTresult.should_return():
-                    return RTresult
-                return RTresult.success(
-                    Number.null if should_return_null else expr_value
-                )
+                expr_value = self.evaluate(expr, context)
+                return Number.null if should_return_null else expr_value
 
         if node.else_case:
             expr, should_return_null = node.else_case
-            expr_value = RTresult.register(self.visit(expr, context))
-            if RTresult.should_return():
-                return RTresult
-            return RTresult.success(Number.null if should_return_null else expr_value)
+            expr_value = self.evaluate(expr, context)
+            return Number.null if should_return_null else expr_value
 
-        return RTresult.success(Number.null)
+        return Number.null
 
-    def visit_ForNode(self, node: ForNode, context: Context):
-        RTresult = RunTimeResult()
-        elements = []
+    def evaluate_ForNode(self, node: ForNode, context: Context):
+        elements = None if node.should_return_null else []
 
         # TODO: Change this to accept list node also once made
-        iterable = RTresult.register(self.visit(node.list_node, context))
-        if RTresult.should_return():
-            return RTresult
+        iterable = self.evaluate(node.list_node, context)
 
         if not isinstance(iterable, List):
-            return RTresult.failure(
+            raise ErrorSignal(
                 RunTimeError(
                     node.list_node.pos_start,
                     node.list_node.pos_end,
@@ -639,161 +636,117 @@ class Interpreter:
                 )
             )
 
-        for item in iterable.elements:
-            context.symbol_table.set(node.var_name_token.value, item)
-
-            value = RTresult.register(self.visit(node.body_node, context))
-            if (
-                RTresult.should_return()
-                and not RTresult.loop_should_continue
-                and not RTresult.loop_should_break
-            ):
-                return RTresult
-
-            if RTresult.loop_should_continue:
+        step = context.budget.step
+        for item in iterable.iterate():
+            if node.slot:
+                context.symbol_table.set_slot(node.slot, item)
+            else:
+                context.symbol_table.set(node.var_name_token.value, item)
+
+            if step():
+                raise ErrorSignal(context.budget.error(*loop_header(node), context))
+            try:
+                value = self.evaluate(node.body_node, context)
+            except ContinueSignal:
                 continue
-
-            if RTresult.loop_should_break:
+            except BreakSignal:
                 break
 
-            elements.append(value)
+            if elements is not None:
+                elements.append(value)
 
-        return RTresult.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        return Number.null if elements is None else List(elements)
 
-    def visit_WhileNode(self, node: WhileNode, context: Context):
-        RTresult = RunTimeResult()
-        elements = []
+    def evaluate_WhileNode(self, node: WhileNode, context: Context):
+        elements = None if node.should_return_null else []
 
+        step = context.budget.step
         while True:
-            condition_value: Number = RTresult.register(
-                self.visit(node.condition_node, context)
+            condition_value: Number = self.evaluate(
+                node.condition_node, context
             )  # TODO: Change this to boolean node once made
-            if RTresult.should_return():
-                return RTresult
 
             if not condition_value.is_true():
                 break
 
-            value = RTresult.register(self.visit(node.body_node, context))
-            if (
-                RTresult.should_return()
-                and not RTresult.loop_should_continue
-                and not RTresult.loop_should_break
-            ):
-                return RTresult
-
-            if RTresult.loop_should_continue:
+            if step():
+                raise ErrorSignal(context.budget.error(*loop_header(node), context))
+            try:
+                value = self.evaluate(node.body_node, context)
+            except ContinueSignal:
                 continue
-
-            if RTresult.loop_should_break:
+            except BreakSignal:
                 break
 
-            elements.append(value)
+            if elements is not None:
+                elements.append(value)
 
-        return RTresult.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        return Number.null if elements is None else List(elements)
 
-    def visit_RepeatUntilNode(self, node: RepeatUntilNode, context: Context):
-        RTresult = RunTimeResult()
-        elements = []
+    def evaluate_RepeatUntilNode(self, node: RepeatUntilNode, context: Context):
+        elements = None if node.should_return_null else []
 
+        step = context.budget.step
         while True:
-            condition_value: Number = RTresult.register(
-                self.visit(node.condition_node, context)
+            condition_value: Number = self.evaluate(
+                node.condition_node, context
             )  # TODO: Change this to boolean node once made
-            if RTresult.should_return():
-                return RTresult
 
             if condition_value.is_true():
                 break
 
-            value = RTresult.register(self.visit(node.body_node, context))
-            if (
-                RTresult.should_return()
-                and not RTresult.loop_should_continue
-                and not RTresult.loop_should_break
-            ):
-                return RTresult
-
-            if RTresult.loop_should_continue:
+            if step():
+                raise ErrorSignal(context.budget.error(*loop_header(node), context))
+            try:
+                value = self.evaluate(node.body_node, context)
+            except ContinueSignal:
                 continue
-
-            if RTresult.loop_should_break:
+            except BreakSignal:
                 break
 
-            elements.append(value)
+            if elements is not None:
+                elements.append(value)
 
-        return RTresult.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        return Number.null if elements is None else List(elements)
 
-    def visit_RepeatNode(self, node: RepeatNode, context: Context):
-        RTresult = RunTimeResult()
-        elements = []
+    def evaluate_RepeatNode(self, node: RepeatNode, context: Context):
+        elements = None if node.should_return_null else []
 
         if node.count_token:
             count: Token = node.count_token
-            if RTresult.should_return():
-                return RTresult
         else:
-            count = RTresult.register(self.visit(node.count_node, context))
-            if RTresult.should_return():
-                return RTresult
+            count = self.evaluate(node.count_node, context)
 
+        step = context.budget.step
         for i in range(count.value):
-            value = RTresult.register(self.visit(node.body_node, context))
-            if (
-                RTresult.should_return()
-                and not RTresult.loop_should_continue
-                and not RTresult.loop_should_break
-            ):
-                return RTresult
-
-            if RTresult.loop_should_continue:
+            if step():
+                raise ErrorSignal(context.budget.error(*loop_header(node), context))
+            try:
+                value = self.evaluate(node.body_node, context)
+            except ContinueSignal:
                 continue
-
-            if RTresult.loop_should_break:
+            except BreakSignal:
                 break
 
-            elements.append(value)
+            if elements is not None:
+                elements.append(value)
 
-        return RTresult.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        return Number.null if elements is None else List(elements)
 
-    def visit_FunctionDefinitionNode(
+    def evaluate_FunctionDefinitionNode(
         self, node: FunctionDefinitionNode, context: Context
     ):
-        RTresult = RunTimeResult()
-
         func_name = (
             node.var_name_token.value if node.var_name_token else None
         )  # TODO: Shouldn't need this if condition later
         body_node = node.body_node
         arg_names = [arg_name.value for arg_name in node.arg_name_tokens]
-        func_value = (
-            Function(func_name, body_node, arg_names, node.should_auto_return)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
+        func_value = Function(
+            func_name,
+            body_node,
+            arg_names,
+            node.should_auto_return,
+            slot_index=node.slot_index,
         )
 
         if (
@@ -801,91 +754,227 @@ class Interpreter:
         ):  # TODO: could prob remove this later after requiring function name
             context.symbol_table.set(func_name, func_value)
 
-        return RTresult.success(func_value)
+        return func_value
 
-    def visit_CallNode(self, node: CallNode, context: Context):
-        RTresult = RunTimeResult()
+    def evaluate_CallNode(self, node: CallNode, context: Context):
         args = []
 
-        value_to_call: Value = RTresult.register(self.visit(node.node_to_call, context))
-        if RTresult.should_return():
-            return RTresult
-        value_to_call: Value = value_to_call.copy().set_pos(
-            node.pos_start, node.pos_end
-        )
+        cache = node.callee_cache
+        value_to_call = cache.get() if cache else None
+        if value_to_call is None:
+            value_to_call: Value = self.evaluate(node.node_to_call, context)
+            if cache and isinstance(value_to_call, BaseFunction):
+                cache.fill(
+                    context.symbol_table,
+                    value_to_call.at_call(node.pos_start, node.pos_end),
+                )
 
         for arg_node in node.arg_nodes:
-            args.append(RTresult.register(self.visit(arg_node, context)))
-            if RTresult.should_return():
-                return RTresult
+            args.append(self.evaluate(arg_node, context))
 
-        return_value = RTresult.register(value_to_call.execute(args))
-        if RTresult.should_return():
-            return RTresult
-        return_value = (
-            return_value.copy()
-            .set_pos(node.pos_start, node.pos_end)
-            .set_context(context)
-        )
-        return RTresult.success(return_value)
+        if node.tail_call and is_tail_call(node.tail_call, value_to_call, args):
+            # A step like any call, counted here since it won't go through execute
+            budget = context.budget
+            if budget.step():
+                raise ErrorSignal(budget.error(node.pos_start, node.pos_end, context))
+            raise TailCallSignal(value_to_call, args)
 
-    def visit_ReturnNode(self, node: ReturnNode, context: Context):
-        RTresult = RunTimeResult()
+        result = value_to_call.execute(args, context, node.pos_start, node.pos_end)
+        if result.should_return():
+            result.raise_signal()
+        return result.value
 
+    def evaluate_ReturnNode(self, node: ReturnNode, context: Context):
         if node.node_to_return:
-            value = RTresult.register(self.visit(node.node_to_return, context))
-            if RTresult.should_return():
-                return RTresult
+            value = self.evaluate(node.node_to_return, context)
         else:
             value = Number.null
 
-        return RTresult.success_return(value)
-
-    def visit_ContinueNode(self, node: ContinueNode, context: Context):
-        return RunTimeResult().success_continue()
-
-    def visit_BreakNode(self, node: BreakNode, context: Context):
-        return RunTimeResult().success_break()
-
-
-global_symbol_table = SymbolTable()
-global_symbol_table.set("NULL", Number.null)
-global_symbol_table.set(
-    100, Robot()
-)  # 100 is just arbitrary. Not using a string so that way this isn't accessible to the user.
-global_symbol_table.set("DISPLAY", BuiltInFunction.display)
-global_symbol_table.set("INPUT", BuiltInFunction.input)
-global_symbol_table.set("RANDOM", BuiltInFunction.random)
-global_symbol_table.set("CLEAR", BuiltInFunction.clear)
-global_symbol_table.set("APPEND", BuiltInFunction.append)
-global_symbol_table.set("INSERT", BuiltInFunction.insert)
-global_symbol_table.set("REMOVE", BuiltInFunction.remove)
-global_symbol_table.set("LENGTH", BuiltInFunction.length)
-global_symbol_table.set("CREATE_GRID", BuiltInFunction.create_grid)
-global_symbol_table.set("MOVE_FORWARD", BuiltInFunction.move_forward)
-global_symbol_table.set("ROTATE_LEFT", BuiltInFunction.rotate_left)
-global_symbol_table.set("ROATE_RIGHT", BuiltInFunction.rotate_right)
-global_symbol_table.set("CAN_MOVE", BuiltInFunction.can_move)
-global_symbol_table.set("FORWARD", String("FORWARD"))
-global_symbol_table.set("RUN", BuiltInFunction.run)
-
-
-def run(fn, text):
-    lexer = Lexer(fn, text)
-    tokens, error = lexer.make_tokens()
-    if error:
-        return None, error
-
-    # Generate Tree
-    parser = Parser(tokens)
-    tree = parser.parse()
-    if tree.error:
-        return None, tree.error
-
-    # Run program
-    interpreter = Interpreter()
-    context = Context("<program>")
-    context.symbol_table = global_symbol_table
-    result = interpreter.visit(tree.node, context)
-
-    return result.value, result.error
+        raise ReturnSignal(value)
+
+    def evaluate_ContinueNode(self, node: ContinueNode, context: Context):
+        raise ContinueSignal()
+
+    def evaluate_BreakNode(self, node: BreakNode, context: Context):
+        raise BreakSignal()
+
+
+# The Interpreter keeps no state of its own, so every call can share one
+Interpreter.shared = Interpreter()
+
+# Key of the Session in its global symbol table. It's arbitrary, but not a
+# string, so that way it isn't accessible to the user.
+SESSION_KEY = 101
+
+# Shared by every global symbol table as its parent. Programs assigning one of
+# these names set a global of their own that shadows it.
+BUILTINS = FrozenSymbolTable(
+    {
+        "NULL": Number.null,
+        "DISPLAY": BuiltInFunction.display,
+        "INPUT": BuiltInFunction.input,
+        "RANDOM": BuiltInFunction.random,
+        "CLEAR": BuiltInFunction.clear,
+        "APPEND": BuiltInFunction.append,
+        "INSERT": BuiltInFunction.insert,
+        "REMOVE": BuiltInFunction.remove,
+        "LENGTH": BuiltInFunction.length,
+        "CREATE_GRID": BuiltInFunction.create_grid,
+        "MOVE_FORWARD": BuiltInFunction.move_forward,
+        "ROTATE_LEFT": BuiltInFunction.rotate_left,
+        "ROATE_RIGHT": BuiltInFunction.rotate_right,
+        "CAN_MOVE": BuiltInFunction.can_move,
+        "FORWARD": String("FORWARD"),
+        "RUN": BuiltInFunction.run,
+    }
+)
+
+
+class Session:
+    """
+    Globals shared by programs run one after another, like the lines typed into
+    the REPL or the scripts they RUN. Each run lexes, parses, resolves and
+    compiles only its own text. Procedures defined by earlier runs stay in
+    symbol_table, compiled, and procedure_names keeps what the Resolver learned
+    about them.
+
+    Sessions share only the read only BUILTINS under their globals, so several
+    can be used in one process, in different threads too. Making one is cheap.
+    """
+
+    def __init__(self):
+        self.symbol_table = SymbolTable(BUILTINS)
+        self.symbol_table.set(SESSION_KEY, self)
+        # What the Resolver learned about the procedures stored in symbol_table
+        self.procedure_names = ProcedureNames()
+        # StepBudget of the last run, whose steps are how many it took
+        self.budget: StepBudget = None
+        # Settings of the last run, which the scripts it RUNs run with too
+        self.mode = "tree"
+        self.short_circuit = True
+        self.max_depth = None
+        self._robot = None
+
+    @property
+    def robot(self):
+        """The Robot the robot builtins move, made the first time it's used"""
+        if self._robot is None:
+            self._robot = Robot()
+        return self._robot
+
+    def run(
+        self,
+        fn,
+        text,
+        mode="tree",
+        short_circuit=True,
+        max_depth=None,
+        cache=False,
+        max_steps=None,
+        timeout=None,
+        budget=None,
+    ):
+        """
+        Runs a program with this session's globals and returns (value, error).
+
+        mode selects the execution engine: "tree" walks the AST with Interpreter,
+        "closure" compiles it into Python closures first and "bytecode" compiles
+        it for the stack based VirtualMachine. "stackless" runs the bytecode with
+        the procedure call stack kept by the VirtualMachine instead of Python, so
+        deep recursion fails with a RunTimeError after max_depth calls rather
+        than running out of Python stack.
+
+        AND and OR skip their right operand once the left one decides the
+        result. Pass short_circuit=False to always evaluate both, like older
+        versions did.
+
+        cache=True reuses the tree of a script file that was run before, from
+        memory or from its cache directory, instead of parsing it again.
+
+        A program that runs loop bodies and procedure calls more than max_steps
+        times in all, or for more than timeout seconds, stops with a RunTimeError
+        where it got to. self.budget.steps is how many it took either way. A
+        budget passed in is counted in instead, like RUN's script does with its
+        caller's.
+        """
+        self.mode = mode
+        self.short_circuit = short_circuit
+        self.max_depth = max_depth
+
+        if cache:
+            node, error = cached_program(fn, text, short_circuit)
+        else:
+            node, error = parse_program(fn, text, short_circuit)
+        if error:
+            return None, error
+
+        Resolver(self.procedure_names).resolve(node)
+
+        if budget is None:
+            budget = StepBudget(max_steps, timeout)
+        return self.execute(node, mode, max_depth, budget)
+
+    def execute(self, node, mode="tree", max_depth=None, budget=None):
+        """
+        Runs a program tree the Resolver annotated with this session's
+        procedure_names and returns (value, error), like run does after parsing.
+        """
+        if budget is None:
+            budget = StepBudget()
+        self.budget = budget
+        context = Context("<program>")
+        context.symbol_table = self.symbol_table
+        context.budget = budget
+        try:
+            if mode == "tree":
+                result = Interpreter.shared.visit(node, context)
+            elif mode == "closure":
+                from compiler.closures import ClosureCompiler
+
+                result = ClosureCompiler().compile_body(node)(context)
+            elif mode in ("bytecode", "stackless"):
+                from compiler.bytecode import BytecodeCompiler
+                from compiler.vm import VirtualMachine, MAX_CALL_DEPTH
+
+                code = BytecodeCompiler().compile_program(node)
+                vm = VirtualMachine(
+                    stackless=mode == "stackless",
+                    max_depth=max_depth or MAX_CALL_DEPTH,
+                )
+                result = vm.run(code, context)
+            else:
+                raise ValueError(f"Unknown execution mode '{mode}'")
+        except RecursionError:
+            # Out of Python stack outside any procedure call, where
+            # Function.execute would have stopped it
+            return None, RunTimeError(
+                node.pos_start,
+                node.pos_end,
+                "Maximum recursion depth exceeded",
+                context,
+            )
+
+        return result.value, result.error
+
+
+def run(
+    fn,
+    text,
+    mode="tree",
+    short_circuit=True,
+    max_depth=None,
+    cache=False,
+    env=None,
+    max_steps=None,
+    timeout=None,
+):
+    """
+    Runs a program and returns (value, error), see Session.run. env is the
+    Session whose globals it runs with, by default a new one, so programs run
+    one after another don't see each other's variables.
+    """
+    if env is None:
+        env = Session()
+    return env.run(
+        fn, text, mode, short_circuit, max_depth, cache, max_steps, timeout
+    )
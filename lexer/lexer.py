@@ -1,4 +1,6 @@
-from utils.position import Position
+import sys
+
+from utils.position import Position, Source
 from lexer.tokens import *
 from utils.errors import IllegalCharError, ExpectedCharacterError
 
@@ -7,19 +9,23 @@ class Lexer:
     def __init__(self, fn, text):
         self.fn = fn
         self.text = text
-        self.pos = Position(-1, 0, -1, fn, text)
+        self.source = Source(fn, text)
+        self.idx = -1
         self.current_char: str = None
         self.advance()
 
+    @property
+    def pos(self):
+        """Position of the current character"""
+        return Position(self.idx, self.source)
+
     def advance(self):
-        self.pos.advance(self.current_char)
-        self.current_char = (
-            self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
-        )
+        self.idx += 1
+        self.current_char = self.text[self.idx] if self.idx < len(self.text) else None
 
     def get_next_char(self):
-        next_pos = self.pos.copy().advance()
-        return self.text[next_pos.idx] if next_pos.idx < len(self.text) else None
+        next_idx = self.idx + 1
+        return self.text[next_idx] if next_idx < len(self.text) else None
 
     def make_tokens(self):
         tokens = []
@@ -43,7 +49,7 @@ class Lexer:
                 self.advance()
             elif self.current_char == "-":
                 if self.get_next_char == ">":
-                    pos_start = self.pos.copy()
+                    pos_start = self.pos
                     self.advance()
                     self.advance()
                     tokens.append(
@@ -54,7 +60,7 @@ class Lexer:
                     self.advance()
             elif self.current_char == "*":
                 if self.get_next_char() == "*":
-                    pos_start = self.pos.copy()
+                    pos_start = self.pos
                     self.advance()
                     self.advance()
                     tokens.append(
@@ -117,7 +123,7 @@ class Lexer:
                 tokens.append(Token(TYPE_COMMA, pos_start=self.pos))
                 self.advance()
             else:
-                pos_start = self.pos.copy()
+                pos_start = self.pos
                 char = self.current_char
                 self.advance()
                 return [], IllegalCharError(pos_start, self.pos, f"'{char}'")
@@ -136,7 +142,7 @@ class Lexer:
     def make_number(self):
         num_str = ""
         dot_count = 0  # to check if float or integer
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         starting_char = self.current_char
 
         while self.current_char is not None and (
@@ -146,7 +152,7 @@ class Lexer:
         ):
             if self.current_char.isalpha():
                 self.current_char = starting_char
-                self.pos.revert(pos_start.idx, pos_start.col, pos_start.ln)
+                self.idx = pos_start.idx
                 return self.make_identifier()
             elif self.current_char == ".":
                 if dot_count == 1:
@@ -166,7 +172,7 @@ class Lexer:
 
     def make_string(self):
         string = ""
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         escape_character = False
         self.advance()
 
@@ -193,7 +199,7 @@ class Lexer:
 
     def make_identifier(self):
         id_str = ""
-        pos_start = self.pos.copy()
+        pos_start = self.pos
 
         while self.current_char is not None and (
             self.current_char.isalnum() or self.current_char == "_"
@@ -201,12 +207,14 @@ class Lexer:
             id_str += self.current_char
             self.advance()
 
+        # Every use of a name shares one string
+        id_str = sys.intern(id_str)
         token_type = TYPE_KEYWORD if id_str in KEYWORDS else TYPE_IDENTIFIER
         return Token(token_type, id_str, pos_start=pos_start, pos_end=self.pos)
 
     def make_minus_or_arrow(self):
         token_type = TYPE_MINUS
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         self.advance()
 
         if self.current_char == ">":
@@ -216,7 +224,7 @@ class Lexer:
         return Token(token_type, pos_start=pos_start, pos_end=self.pos)
 
     def make_not_equals(self):
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         self.advance()
 
         if self.current_char == "=":
@@ -228,7 +236,7 @@ class Lexer:
 
     def make_equals(self):
         token_type = TYPE_EQ
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         self.advance()
 
         if self.current_char == "=":
@@ -239,7 +247,7 @@ class Lexer:
 
     def make_less_than(self):
         token_type = TYPE_LT
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         self.advance()
 
         if self.current_char == "=":
@@ -253,7 +261,7 @@ class Lexer:
 
     def make_greater_than(self):
         token_type = TYPE_GT
-        pos_start = self.pos.copy()
+        pos_start = self.pos
         self.advance()
 
         if self.current_char == "=":
@@ -0,0 +1,182 @@
+import re
+import sys
+
+from utils.position import Position
+from lexer.lexer import Lexer
+from lexer.tokens import *
+from utils.errors import IllegalCharError, ExpectedCharacterError
+
+
+# One alternative per kind of token, tried at the current offset after any
+# spaces. Names only start with an ASCII letter here; any other character is
+# an "other" token, classified with the same str methods Lexer uses.
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ \t]*
+    (?:
+        (?P<name>[A-Za-z_]\w*)
+        | (?P<operator>\*\*|==|!=|<=|>=|<-|[-+*/%^()\[\]{},=<>←])
+        | (?P<newline>\n)
+        | (?P<number>[0-9]+(?:\.[0-9]*)?)
+        | (?P<string>"(?:[^"\\]|\\.)*(?:(?P<closed>")|(?P<backslash>\\)?\Z))
+        | (?P<comment>\#[^\n]*\n?)
+        | (?P<other>.)
+        | \Z
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+ESCAPE_PATTERN = re.compile(r"\\(.)", re.DOTALL)
+
+ESCAPE_CHARACTERS = {"n": "\n", "t": "\t"}
+
+# Token type and value of each operator
+OPERATORS = {
+    "+": (TYPE_PLUS, None),
+    "-": (TYPE_MINUS, None),
+    "*": (TYPE_MUL, None),
+    "**": (TYPE_POW, "**"),
+    "/": (TYPE_DIV, None),
+    "%": (TYPE_KEYWORD, "MOD"),
+    "^": (TYPE_POW, None),
+    "(": (TYPE_LPAREN, None),
+    ")": (TYPE_RPAREN, None),
+    "[": (TYPE_LSQUARE, None),
+    "]": (TYPE_RSQUARE, None),
+    "{": (TYPE_LCURL, None),
+    "}": (TYPE_RCURL, None),
+    ",": (TYPE_COMMA, None),
+    "=": (TYPE_EQ, None),
+    "←": (TYPE_EQ, None),
+    "<-": (TYPE_EQ, None),
+    "==": (TYPE_EE, None),
+    "!=": (TYPE_NE, None),
+    "<": (TYPE_LT, None),
+    "<=": (TYPE_LTE, None),
+    ">": (TYPE_GT, None),
+    ">=": (TYPE_GTE, None),
+}
+
+
+class RegexLexer(Lexer):
+    """
+    Makes the same tokens and errors as Lexer in one pass of a compiled
+    pattern, slicing each token's text out of the source instead of building
+    it a character at a time.
+
+    Names starting outside ASCII, and numbers running into a letter or into
+    anything outside ASCII, are handed to Lexer's own make_identifier and
+    make_number, which decide what isalpha() and isdigit() make of them.
+    A comment at the very end of the text, with no newline after it, ends
+    the tokens, where Lexer keeps looking for the newline forever.
+    """
+
+    def make_tokens(self):
+        tokens = list(self.generate_tokens())
+        if self.error:
+            return [], self.error
+        return tokens, None
+
+    def generate_tokens(self):
+        """
+        Yields the tokens one at a time as the text is scanned, ending with EOF.
+        A lexing error ends the tokens early with an EOF where it happened, and
+        is left in self.error once the generator is done.
+        """
+        self.error = None
+        text = self.text
+        source = self.source
+        end = 0
+        new_token = object.__new__
+        intern = sys.intern
+        next_match = TOKEN_PATTERN.scanner(text).match
+
+        while True:
+            match = next_match()
+            kind = match.lastgroup
+            if kind is None:
+                break
+            idx, end = match.span(kind)
+
+            if kind == "name":
+                value = intern(match.group(kind))
+                type_ = TYPE_KEYWORD if value in KEYWORDS else TYPE_IDENTIFIER
+            elif kind == "operator":
+                type_, value = OPERATORS[match.group(kind)]
+            elif kind == "newline":
+                type_, value = TYPE_NEWLINE, None
+            elif kind == "number":
+                next_char = text[end : end + 1]
+                if next_char > "\x7f" or next_char.isalpha():
+                    # Lexer reads a number running into a letter as a name,
+                    # like 2nd, and its own make_number knows what else to do
+                    token = self.scanned(self.make_number, idx)
+                    end = token.end
+                    yield token
+                    next_match = TOKEN_PATTERN.scanner(text, token.end).match
+                    continue
+                number = match.group(kind)
+                if "." in number:
+                    type_, value = TYPE_FLOAT, float(number)
+                else:
+                    type_, value = TYPE_INT, int(number)
+            elif kind == "string":
+                type_ = TYPE_STRING
+                if match.group("closed"):
+                    value = text[idx + 1 : end - 1]
+                else:
+                    # Lexer drops a backslash left at the very end of an unclosed
+                    # string, and steps past the end of the text
+                    value = text[idx + 1 : end - len(match.group("backslash") or "")]
+                    end += 1
+                if "\\" in value:
+                    value = ESCAPE_PATTERN.sub(unescape, value)
+            elif kind == "comment":
+                continue
+            else:
+                char = text[idx]
+                if char.isdigit() or char.isalpha():
+                    make_token = (
+                        self.make_number if char.isdigit() else self.make_identifier
+                    )
+                    token = self.scanned(make_token, idx)
+                    end = token.end
+                    yield token
+                    next_match = TOKEN_PATTERN.scanner(text, token.end).match
+                    continue
+                if char == "!":
+                    self.error = ExpectedCharacterError(
+                        Position(idx, source),
+                        Position(idx + 2, source),
+                        "'=' (after '!')",
+                    )
+                else:
+                    self.error = IllegalCharError(
+                        Position(idx, source), Position(idx + 1, source), f"'{char}'"
+                    )
+                yield Token.spanning(TYPE_EOF, None, source, idx, idx + 1)
+                return
+
+            # Token.spanning without the calls, for the token at idx..end
+            token = new_token(Token)
+            token.type = type_
+            token.value = value
+            token.source = source
+            token.start = idx
+            token.end = end
+            yield token
+
+        # After the end of the text, or of an unclosed string that went past it
+        end = max(len(text), end)
+        yield Token.spanning(TYPE_EOF, None, source, end, end + 1)
+
+    def scanned(self, make_token, idx):
+        """Makes the token starting at idx with one of Lexer's make_* methods"""
+        self.idx = idx
+        self.current_char = self.text[idx]
+        return make_token()
+
+
+def unescape(match):
+    char = match.group(1)
+    return ESCAPE_CHARACTERS.get(char, char)
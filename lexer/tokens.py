@@ -1,4 +1,4 @@
-from utils.position import Position
+from utils.position import Position, end_position
 
 # Token types
 TYPE_INT = "INT"
@@ -59,18 +59,41 @@ KEYWORDS = [
 
 
 class Token:
+    """
+    A token keeps its span as offsets into the Source, and only makes
+    Positions for it when pos_start or pos_end is read.
+    """
+
+    __slots__ = ("type", "value", "source", "start", "end")
+
     def __init__(
         self, type_, value=None, pos_start: Position = None, pos_end: Position = None
     ):
         self.type = type_
         self.value = value
+        self.source = self.start = self.end = None
 
         if pos_start:
-            self.pos_start = pos_start.copy()
-            self.pos_end = pos_start.copy()
-            self.pos_end.advance()
-        if pos_end:
-            self.pos_end = pos_end.copy()
+            self.source = pos_start.source
+            self.start = pos_start.idx
+            self.end = pos_end.idx if pos_end else pos_start.idx + 1
+
+    @classmethod
+    def spanning(cls, type_, value, source, start, end):
+        """Makes a token for the text of source from offset start to end"""
+        token = cls(type_, value)
+        token.source = source
+        token.start = start
+        token.end = end
+        return token
+
+    @property
+    def pos_start(self):
+        return Position(self.start, self.source) if self.source else None
+
+    @property
+    def pos_end(self):
+        return end_position(self.end, self.source) if self.source else None
 
     def matches(self, type_, value):
         return self.type == type_ and self.value == value
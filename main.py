@@ -1,10 +1,13 @@
-from interpreter import run
+from interpreter import Session
+
+# Every line typed in runs in the same session, so it sees what earlier ones defined
+session = Session()
 
 while True:
     text = input(">>>")
     if text.strip() == "":
         continue
-    result, error = run("<stdn>", text)
+    result, error = session.run("<stdn>", text)
 
     if error:
         print(error.as_string())
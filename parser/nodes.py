@@ -2,6 +2,8 @@ from lexer.tokens import Token
 
 
 class NumberNode:
+    __slots__ = ("token", "pos_start", "pos_end")
+
     def __init__(self, token: Token):
         self.token = token
 
@@ -13,6 +15,8 @@ class NumberNode:
 
 
 class BooleanNode:
+    __slots__ = ("token", "pos_start", "pos_end")
+
     def __init__(self, token: Token):
         self.token = token
 
@@ -24,6 +28,8 @@ class BooleanNode:
 
 
 class StringNode:
+    __slots__ = ("token", "pos_start", "pos_end")
+
     def __init__(self, token: Token):
         self.token = token
 
@@ -35,35 +41,65 @@ class StringNode:
 
 
 class ListNode:
+    __slots__ = ("element_nodes", "value_used", "pos_start", "pos_end")
+
     def __init__(self, element_nodes, pos_start, pos_end):
         self.element_nodes = element_nodes
+        self.value_used = True  # cleared by the Optimizer for blocks whose List is never used
 
         self.pos_start = pos_start
         self.pos_end = pos_end
 
 
 class VariableAccessNode:
+    __slots__ = ("var_name_token", "slot", "pos_start", "pos_end")
+
     def __init__(self, var_name_token: Token):
         self.var_name_token = var_name_token
+        self.slot = None  # (depth, index) in a procedure frame, set by the Resolver
 
         self.pos_start = var_name_token.pos_start
         self.pos_end = var_name_token.pos_end
 
 
 class VariableAssignNode:
+    __slots__ = ("var_name_token", "value_node", "slot", "pos_start", "pos_end")
+
     def __init__(self, var_name_token: Token, value_node):
         self.var_name_token = var_name_token
         self.value_node = value_node
+        self.slot = None
 
         self.pos_start = var_name_token.pos_start
         self.pos_end = value_node.pos_end
 
 
 class BinaryOperatorNode:
-    def __init__(self, left_node, operator_token: Token, right_node):
+    __slots__ = (
+        "left_node",
+        "operator_token",
+        "right_node",
+        "short_circuit",
+        "operator",
+        "number_operation",
+        "short_circuit_on",
+        "pos_start",
+        "pos_end",
+    )
+
+    def __init__(self, left_node, operator_token: Token, right_node, short_circuit=True):
         self.left_node = left_node
         self.operator_token = operator_token
         self.right_node = right_node
+        self.short_circuit = short_circuit
+        # (left, right) -> (result, error), set by the Resolver so it's looked up
+        # once instead of on every evaluation
+        self.operator = None
+        # The operator's Number x Number fast path, or None, also set by the Resolver
+        self.number_operation = None
+        # For AND / OR, the left value that makes evaluating right_node
+        # unnecessary, also set by the Resolver
+        self.short_circuit_on = None
 
         self.pos_start = left_node.pos_start
         self.pos_end = right_node.pos_end
@@ -73,9 +109,13 @@ class BinaryOperatorNode:
 
 
 class UnaryOperatorNode:
+    __slots__ = ("operator_token", "node", "operator", "pos_start", "pos_end")
+
     def __init__(self, operator_token: Token, node):
         self.operator_token = operator_token
         self.node = node
+        # operand -> (result, error), or None for a unary plus, set by the Resolver
+        self.operator = None
 
         self.pos_start = operator_token.pos_start
         self.pos_end = node.pos_end
@@ -85,6 +125,8 @@ class UnaryOperatorNode:
 
 
 class IfNode:
+    __slots__ = ("cases", "else_case", "pos_start", "pos_end")
+
     def __init__(self, cases, else_case):
         self.cases = cases
         self.else_case = else_case
@@ -94,17 +136,36 @@ class IfNode:
 
 
 class ForNode:
+    __slots__ = (
+        "var_name_token",
+        "list_node",
+        "body_node",
+        "should_return_null",
+        "slot",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(self, var_name_token, list_node, body_node, should_return_null):
         self.var_name_token: Token = var_name_token
         self.list_node = list_node
         self.body_node = body_node
         self.should_return_null = should_return_null
+        self.slot = None
 
         self.pos_start = var_name_token.pos_start
         self.pos_end = body_node.pos_end
 
 
 class WhileNode:
+    __slots__ = (
+        "condition_node",
+        "body_node",
+        "should_return_null",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(self, condition_node, body_node, should_return_null):
         self.condition_node = condition_node
         self.body_node = body_node
@@ -115,6 +176,14 @@ class WhileNode:
 
 
 class RepeatUntilNode:
+    __slots__ = (
+        "condition_node",
+        "body_node",
+        "should_return_null",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(self, condition_node, body_node, should_return_null):
         self.condition_node = condition_node
         self.body_node = body_node
@@ -125,6 +194,15 @@ class RepeatUntilNode:
 
 
 class RepeatNode:
+    __slots__ = (
+        "count_token",
+        "body_node",
+        "should_return_null",
+        "count_node",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(
         self,
         count_token=None,
@@ -147,6 +225,16 @@ class RepeatNode:
 
 
 class FunctionDefinitionNode:
+    __slots__ = (
+        "var_name_token",
+        "arg_name_tokens",
+        "body_node",
+        "should_auto_return",
+        "slot_index",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(
         self,
         var_name_token: Token,
@@ -158,6 +246,7 @@ class FunctionDefinitionNode:
         self.arg_name_tokens = arg_name_tokens
         self.body_node = body_node
         self.should_auto_return = should_auto_return
+        self.slot_index = None  # local name -> frame index, set by the Resolver
 
         if self.var_name_token:
             self.pos_start = self.var_name_token.pos_start
@@ -170,9 +259,21 @@ class FunctionDefinitionNode:
 
 
 class CallNode:
+    __slots__ = (
+        "node_to_call",
+        "arg_nodes",
+        "tail_call",
+        "callee_cache",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(self, node_to_call, arg_nodes):
         self.node_to_call = node_to_call
         self.arg_nodes = arg_nodes
+        # (procedure locals, free names) set by the Resolver for a RETURN f(...) outside loops
+        self.tail_call = None
+        self.callee_cache = None  # CalleeCache set by the Resolver when calling a name
 
         self.pos_start = self.node_to_call.pos_start
 
@@ -185,6 +286,8 @@ class CallNode:
 
 
 class ReturnNode:
+    __slots__ = ("node_to_return", "pos_start", "pos_end")
+
     def __init__(self, node_to_return, pos_start, pos_end):
         self.node_to_return = node_to_return
 
@@ -193,12 +296,114 @@ class ReturnNode:
 
 
 class ContinueNode:
+    __slots__ = ("pos_start", "pos_end")
+
     def __init__(self, pos_start, pos_end):
         self.pos_start = pos_start
         self.pos_end = pos_end
 
 
 class BreakNode:
+    __slots__ = ("pos_start", "pos_end")
+
     def __init__(self, pos_start, pos_end):
         self.pos_start = pos_start
         self.pos_end = pos_end
+
+
+def iter_child_nodes(node):
+    """Yields the direct child nodes of node in evaluation order"""
+    if isinstance(node, ListNode):
+        yield from node.element_nodes
+    elif isinstance(node, VariableAssignNode):
+        yield node.value_node
+    elif isinstance(node, BinaryOperatorNode):
+        yield node.left_node
+        yield node.right_node
+    elif isinstance(node, UnaryOperatorNode):
+        yield node.node
+    elif isinstance(node, IfNode):
+        for condition, expr, _ in node.cases:
+            yield condition
+            yield expr
+        if node.else_case:
+            yield node.else_case[0]
+    elif isinstance(node, ForNode):
+        yield node.list_node
+        yield node.body_node
+    elif isinstance(node, (WhileNode, RepeatUntilNode)):
+        yield node.condition_node
+        yield node.body_node
+    elif isinstance(node, RepeatNode):
+        if node.count_node:
+            yield node.count_node
+        yield node.body_node
+    elif isinstance(node, FunctionDefinitionNode):
+        yield node.body_node
+    elif isinstance(node, CallNode):
+        yield node.node_to_call
+        yield from node.arg_nodes
+    elif isinstance(node, ReturnNode):
+        if node.node_to_return:
+            yield node.node_to_return
+
+
+def loop_header(node):
+    """(pos_start, pos_end) of what decides how many times a loop runs"""
+    if isinstance(node, ForNode):
+        header = node.list_node
+    elif isinstance(node, RepeatNode):
+        header = node.count_token or node.count_node
+    else:
+        header = node.condition_node
+    return header.pos_start, header.pos_end
+
+
+
+
+# The slots of each node type holding nodes, or lists and tuples of them
+CHILD_SLOTS = {
+    ListNode: ("element_nodes",),
+    VariableAssignNode: ("value_node",),
+    BinaryOperatorNode: ("left_node", "right_node"),
+    UnaryOperatorNode: ("node",),
+    IfNode: ("cases", "else_case"),
+    ForNode: ("list_node", "body_node"),
+    WhileNode: ("condition_node", "body_node"),
+    RepeatUntilNode: ("condition_node", "body_node"),
+    RepeatNode: ("body_node", "count_node"),
+    FunctionDefinitionNode: ("body_node",),
+    CallNode: ("node_to_call", "arg_nodes"),
+    ReturnNode: ("node_to_return",),
+}
+for node_type in (
+    NumberNode,
+    BooleanNode,
+    StringNode,
+    VariableAccessNode,
+    ContinueNode,
+    BreakNode,
+):
+    CHILD_SLOTS[node_type] = ()
+
+
+def clone_tree(value):
+    """
+    A copy of every node under value, for the Resolver and the engines to
+    annotate without touching the original. Tokens and positions are never
+    changed after lexing, so the copy shares them.
+    """
+    cls = type(value)
+    child_slots = CHILD_SLOTS.get(cls)
+    if child_slots is not None:
+        copy = object.__new__(cls)
+        for name in cls.__slots__:
+            setattr(copy, name, getattr(value, name))
+        for name in child_slots:
+            setattr(copy, name, clone_tree(getattr(value, name)))
+        return copy
+    if cls is list:
+        return [clone_tree(item) for item in value]
+    if cls is tuple:
+        return tuple([clone_tree(item) for item in value])
+    return value
@@ -4,43 +4,56 @@ from utils.results import ParseResult
 from parser.nodes import *
 
 
+# How tightly each comparison and arithmetic operator binds, looser first
+COMPARISON, ARITHMETIC, TERM = 1, 2, 3
+OPERATOR_PRECEDENCE = {
+    TYPE_EE: COMPARISON,
+    TYPE_NE: COMPARISON,
+    TYPE_LT: COMPARISON,
+    TYPE_GT: COMPARISON,
+    TYPE_LTE: COMPARISON,
+    TYPE_GTE: COMPARISON,
+    TYPE_PLUS: ARITHMETIC,
+    TYPE_MINUS: ARITHMETIC,
+    TYPE_MUL: TERM,
+    TYPE_DIV: TERM,
+    (TYPE_KEYWORD, "MOD"): TERM,
+}
+
+
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.token_idx = -1
+    """
+    Parses a list of tokens, or any iterable of them such as
+    RegexLexer.generate_tokens(), looking at most one token ahead. It never
+    goes back over tokens it has passed, so tokens from an iterable are pulled
+    only when the parser reaches them and dropped once it has moved on.
+    """
+
+    def __init__(self, tokens, short_circuit=True):
+        self.tokens = iter(tokens)
+        self.short_circuit = short_circuit
+        self.current_token: Token = None
+        self.next_token: Token = None
         self.advance()
 
     def advance(self) -> Token:
-        self.token_idx += 1
-        self.update_current_token()
-        return self.current_token
-
-    def reverse(self, amount=1) -> Token:
-        self.token_idx -= amount
-        self.update_current_token()
+        if self.next_token is not None:
+            self.current_token = self.next_token
+            self.next_token = None
+        else:
+            # The last token, EOF, stays current once the tokens run out
+            self.current_token = next(self.tokens, self.current_token)
         return self.current_token
 
-    def update_current_token(self):
-        if self.token_idx < len(self.tokens):
-            self.current_token: Token = self.tokens[self.token_idx]
-
     def get_next_token(self) -> Token:
-        return (
-            self.tokens[self.token_idx + 1]
-            if self.token_idx + 1 < len(self.tokens)
-            else None
-        )
+        if self.next_token is None:
+            self.next_token = next(self.tokens, None)
+        return self.next_token
 
     def parse(self):
         result = self.statements(initial=True)
         if not result.error and self.current_token.type != TYPE_EOF:
-            return result.failure(
-                InvalidSyntaxError(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "Expected '+', '-', '*', or '/'",
-                )
-            )
+            return result.failure(self.expected_end(self.current_token, initial=True))
         return result
 
     def if_expr_cases(self, case_keyword):
@@ -661,7 +674,7 @@ class Parser:
 
     def list_expr(self):
         result = ParseResult()
-        start_pos = self.current_token.pos_start.copy()
+        start_pos = self.current_token.pos_start
         element_nodes = []
 
         if self.current_token.type != TYPE_LSQUARE:
@@ -716,7 +729,7 @@ class Parser:
             ListNode(
                 element_nodes=element_nodes,
                 pos_start=start_pos,
-                pos_end=self.current_token.pos_end.copy(),
+                pos_end=self.current_token.pos_end,
             )
         )
 
@@ -882,13 +895,31 @@ class Parser:
 
         return self.power()
 
-    def term(self):
-        return self.binary_operation(
-            self.factor, (TYPE_DIV, TYPE_MUL, (TYPE_KEYWORD, "MOD"))
-        )
+    def operation(self, min_precedence):
+        """
+        Parses factors joined by comparison and arithmetic operators binding at
+        least as tightly as min_precedence. Each operator's right operand takes
+        only tighter operators, so equal ones group to the left.
+        """
+        result = ParseResult()
+        left = result.register(self.factor())
+        if result.error:
+            return result
 
-    def arith_expr(self):
-        return self.binary_operation(self.term, (TYPE_PLUS, TYPE_MINUS))
+        while True:
+            op_token = self.current_token
+            precedence = OPERATOR_PRECEDENCE.get(op_token.type)
+            if precedence is None:
+                precedence = OPERATOR_PRECEDENCE.get((op_token.type, op_token.value), 0)
+            if precedence < min_precedence:
+                return result.success(left)
+
+            result.register_advancement()
+            self.advance()
+            right = result.register(self.operation(precedence + 1))
+            if result.error:
+                return result
+            left = BinaryOperatorNode(left, op_token, right, self.short_circuit)
 
     def comp_expr(self):
         result = ParseResult()
@@ -903,12 +934,7 @@ class Parser:
                 return result
             return result.success(UnaryOperatorNode(op_token, node))
 
-        node = result.register(
-            self.binary_operation(
-                self.arith_expr,
-                (TYPE_EE, TYPE_NE, TYPE_LT, TYPE_GT, TYPE_LTE, TYPE_GTE),
-            )
-        )
+        node = result.register(self.operation(COMPARISON))
 
         if result.error:
             return result.failure(
@@ -960,31 +986,41 @@ class Parser:
 
     def statement(self):
         result = ParseResult()
-        pos_start = self.current_token.pos_start.copy()
+        pos_start = self.current_token.pos_start
 
         if self.current_token.matches(TYPE_KEYWORD, "RETURN"):
+            return_token = self.current_token
             result.register_advancement()
             self.advance()
 
-            expr = result.try_register(self.expr())
-            if not expr:
-                self.reverse(result.to_reverse_count)
-            return result.success(
-                ReturnNode(expr, pos_start, self.current_token.pos_end.copy())
-            )
+            expr_token = self.current_token
+            expr_result = self.expr()
+            if not expr_result.error:
+                expr = result.register(expr_result)
+                return result.success(
+                    ReturnNode(expr, pos_start, self.current_token.pos_end)
+                )
+            if expr_result.advance_count:
+                # A RETURN without a value, and the statements end where the
+                # expression started. Running into the end of the file counts
+                # one more token, so that ends them at the RETURN itself.
+                if isinstance(expr_result.error, EndOfFile):
+                    expr_token = return_token
+                result.stop_token = expr_token
+            return result.success(ReturnNode(None, pos_start, expr_token.pos_end))
 
         if self.current_token.matches(TYPE_KEYWORD, "CONTINUE"):
             result.register_advancement()
             self.advance()
             return result.success(
-                ContinueNode(pos_start, self.current_token.pos_end.copy())
+                ContinueNode(pos_start, self.current_token.pos_end)
             )
 
         if self.current_token.matches(TYPE_KEYWORD, "BREAK"):
             result.register_advancement()
             self.advance()
             return result.success(
-                BreakNode(pos_start, self.current_token.pos_end.copy())
+                BreakNode(pos_start, self.current_token.pos_end)
             )
 
         expr = result.register(self.expr())
@@ -992,7 +1028,7 @@ class Parser:
             return result.failure(
                 InvalidSyntaxError(
                     pos_start=pos_start,
-                    pos_end=self.current_token.pos_end.copy(),
+                    pos_end=self.current_token.pos_end,
                     details="Expected 'RETURN', 'CONTINUE', 'BREAK', 'IF', 'WHILE', FOR', 'PROCEDURE', int, float, identifier, '+', '-', '[', '(', or 'NOT'",
                 )
             )
@@ -1000,9 +1036,16 @@ class Parser:
         return result.success(expr)
 
     def statements(self, initial=False):
+        """
+        Parses statements on separate lines. A statement after the first that
+        fails to parse ends them instead, and at the top level only one that
+        runs into the end of the file does. If it got past its first token,
+        what follows the statements, '}' or the end of the file, is expected
+        at that token instead of wherever the statement went wrong.
+        """
         result = ParseResult()
         statements = []
-        pos_start = self.current_token.pos_start.copy()
+        pos_start = self.current_token.pos_start
 
         while self.current_token.type == TYPE_NEWLINE:
             result.register_advancement()
@@ -1010,10 +1053,11 @@ class Parser:
 
         if initial and self.current_token.type == TYPE_EOF:
             return result.success(
-                ListNode(statements, pos_start, self.current_token.pos_end.copy())
+                ListNode(statements, pos_start, self.current_token.pos_end)
             )
 
-        statement = result.register(self.statement())
+        statement_result = self.statement()
+        statement = result.register(statement_result)
         if result.error:
             if isinstance(result.error, EndOfFile) and initial:
                 result.last_registered_advance_count = 0
@@ -1025,10 +1069,12 @@ class Parser:
                     )
                 )
             return result
+        if statement_result.stop_token:
+            return result.failure(
+                self.expected_end(statement_result.stop_token, initial)
+            )
         statements.append(statement)
 
-        more_statements = True
-
         while True:
             newline_count = 0
             while self.current_token.type == TYPE_NEWLINE:
@@ -1036,41 +1082,35 @@ class Parser:
                 self.advance()
                 newline_count += 1
             if newline_count == 0:
-                more_statements = False
-
-            if not more_statements:
                 break
-            if initial:
-                statement = result.try_eof_register(self.statement())
-                if result.error:
-                    while self.current_token.type == TYPE_NEWLINE:
-                        result.register_advancement()
-                        self.advance()
-                    if self.current_token.type == TYPE_EOF:
-                        statement = None
-                    else:
-                        return result
-            else:
-                statement = result.try_register(self.statement())
-                # if result.error and not isinstance(result.error, EndOfFile):
-                #     if result.last_registered_advance_count != 0:
-                #         return result
-                #     else:
-                #         statement = None
-                # elif isinstance(result.error, EndOfFile):
-                #     statement = None
-                #     result.error = None
-
-            if not statement:
-                self.reverse(result.to_reverse_count)
-                more_statements = False
-                continue
-            statements.append(statement)
+
+            statement_token = self.current_token
+            statement_result = self.statement()
+            if statement_result.error:
+                if initial and not isinstance(statement_result.error, EndOfFile):
+                    result.register(statement_result)
+                    return result
+                if self.current_token is statement_token:
+                    break
+                return result.failure(self.expected_end(statement_token, initial))
+            if statement_result.stop_token:
+                return result.failure(
+                    self.expected_end(statement_result.stop_token, initial)
+                )
+            statements.append(result.register(statement_result))
 
         return result.success(
-            ListNode(statements, pos_start, self.current_token.pos_end.copy())
+            ListNode(statements, pos_start, self.current_token.pos_end)
         )
 
+    def expected_end(self, token, initial):
+        """The error for finding token where statements should end"""
+        if initial:
+            return InvalidSyntaxError(
+                token.pos_start, token.pos_end, "Expected '+', '-', '*', or '/'"
+            )
+        return InvalidSyntaxError(token.pos_start, token.pos_end, "Expected '}'")
+
     def binary_operation(self, func_a, op_tokens, func_b=None) -> ParseResult:
         result = ParseResult()
         left = result.register(func_a())
@@ -1087,6 +1127,6 @@ class Parser:
             right = result.register(func_b()) if func_b else result.register(func_a())
             if result.error:
                 return result
-            left = BinaryOperatorNode(left, op_token, right)
+            left = BinaryOperatorNode(left, op_token, right, self.short_circuit)
 
         return result.success(left)
@@ -149,7 +149,7 @@ class Robot:
 
     def can_move(self, direction) -> bool:
         if self.running:
-            return RunTimeResult().success(Boolean(self.commands.can_move(direction)))
+            return RunTimeResult().success(Boolean.of(self.commands.can_move(direction)))
         elif not self.grid_created:
             return RunTimeResult().failure(
                 GridError(
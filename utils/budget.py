@@ -0,0 +1,56 @@
+import sys
+import time
+
+from utils.errors import RunTimeError
+
+
+# Steps between reads of the clock when a run has a timeout
+CLOCK_INTERVAL = 1024
+
+
+class StepBudget:
+    """
+    Counts the steps of a run, each time a loop runs its body or a procedure is
+    called, and stops it once it has taken more than max_steps or run for more
+    than timeout seconds. Every frame of the run shares one, as context.budget.
+
+    A step is an addition and a comparison. The clock is only read every
+    CLOCK_INTERVAL steps, so a run can go a little past its timeout.
+    """
+
+    __slots__ = ("steps", "max_steps", "timeout", "deadline", "next_check", "reason")
+
+    def __init__(self, max_steps=None, timeout=None):
+        self.steps = 0
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.reason = None
+        self.next_check = 0
+        self.exceeded()
+
+    def step(self):
+        """Counts a step, and returns True if the run has to stop"""
+        self.steps += 1
+        return self.steps >= self.next_check and self.exceeded()
+
+    def exceeded(self):
+        """Whether the run is over budget, working out when to check again if not"""
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.reason = f"Took more than {self.max_steps} steps"
+            return True
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.reason = f"Took more than {self.timeout} seconds"
+            return True
+
+        next_check = sys.maxsize
+        if self.max_steps is not None:
+            next_check = self.max_steps + 1
+        if self.deadline is not None:
+            next_check = min(next_check, self.steps + CLOCK_INTERVAL)
+        self.next_check = next_check
+        return False
+
+    def error(self, pos_start, pos_end, context):
+        """The error stopping the run at the step taken at pos_start..pos_end"""
+        return RunTimeError(pos_start, pos_end, self.reason, context)
@@ -2,26 +2,214 @@ from utils.position import Position
 
 
 class Context:
+    __slots__ = (
+        "display_name",
+        "parent",
+        "parent_entry_pos",
+        "symbol_table",
+        "tail_calls",
+        "budget",
+    )
+
     def __init__(self, display_name, parent=None, parent_entry_pos: Position = None):
         self.display_name = display_name
         self.parent = parent
         self.parent_entry_pos: Position = parent_entry_pos
         self.symbol_table: "SymbolTable" = None
+        # Calls this one replaced by running in their place, shown in tracebacks
+        self.tail_calls = 0
+        # StepBudget of the run, shared by all of its frames
+        self.budget = parent.budget if parent is not None else None
 
 
 class SymbolTable:
-    def __init__(self, parent=None):
+    """
+    Variables of one scope. Procedure locals that the Resolver found live in the
+    slots array at a fixed index; everything else lives in the symbols dict.
+    Lookups by name see both, so the parent chain works the same either way.
+    """
+
+    __slots__ = ("symbols", "parent", "slot_index", "slots", "versions")
+
+    frozen = False
+
+    def __init__(self, parent=None, slot_index: dict = None):
         self.symbols = {}
         self.parent: SymbolTable = parent
+        self.slot_index = slot_index or {}
+        self.slots = [None] * len(self.slot_index)
+        # Version of each name a CalleeCache looked up here, dropped when the name is set
+        self.versions = {}
 
     def get(self, name):
-        value = self.symbols.get(name, None)
-        if value is None and self.parent:
-            return self.parent.get(name)
+        table = self
+        while table is not None:
+            value = table.symbols.get(name, None)
+            if value is None and table.slot_index:
+                index = table.slot_index.get(name, None)
+                if index is not None:
+                    value = table.slots[index]
+            if value is not None:
+                return value
+            table = table.parent
+        return None
+
+    def get_slot(self, slot, name):
+        """Reads a resolved (depth, index) slot, falling back to the parent chain if it's unset"""
+        depth, index = slot
+        table = self
+        for _ in range(depth):
+            table = table.parent
+        value = table.slots[index]
+        if value is None and table.parent:
+            return table.parent.get(name)
         return value
 
     def set(self, name, value):
-        self.symbols[name] = value
+        index = self.slot_index.get(name, None)
+        if index is None:
+            self.symbols[name] = value
+            if self.versions:
+                self.versions.pop(name, None)
+        else:
+            self.slots[index] = value
+
+    def set_slot(self, slot, value):
+        depth, index = slot
+        table = self
+        for _ in range(depth):
+            table = table.parent
+        table.slots[index] = value
 
     def remove(self, name):
-        del self.symbols[name]
+        index = self.slot_index.get(name, None)
+        if index is None:
+            del self.symbols[name]
+            self.versions.pop(name, None)
+        else:
+            self.slots[index] = None
+
+    def version(self, name):
+        """Returns an object that stays the version of name until name is set or removed"""
+        version = self.versions.get(name)
+        if version is None:
+            version = self.versions[name] = object()
+        return version
+
+    def clear(self):
+        """Removes every name stored in the symbols dict"""
+        self.symbols = {}
+        self.versions = {}
+
+
+class FrozenSymbolTable(SymbolTable):
+    """
+    A symbol table that can't be changed once it's made, like the builtins under
+    every global symbol table. Nothing writes to it, so any number of sessions
+    and threads can share one.
+    """
+
+    __slots__ = ()
+
+    frozen = True
+
+    def __init__(self, symbols: dict):
+        super().__init__()
+        self.symbols = dict(symbols)
+
+    def read_only(self, *args):
+        raise TypeError("FrozenSymbolTable can't be changed")
+
+    set = set_slot = remove = version = clear = read_only
+
+
+class CalleeCache:
+    """
+    Inline cache of what the name a CallNode calls resolves to, like DISPLAY or
+    a procedure calling itself, so the call doesn't walk the caller chain.
+
+    Only names no procedure keeps as a local are cached. No frame can hold
+    those, so from any frame they resolve to the global symbol table, or to the
+    builtins under it, and the cached callee stays right until the name's
+    version in the global symbol table changes. Setting a global that shadows
+    a builtin changes it too.
+    """
+
+    __slots__ = ("name", "local_names", "table", "version", "callee")
+
+    def __init__(self, name, local_names: set):
+        self.name = name
+        self.local_names = local_names
+        self.table: SymbolTable = None
+        self.version = None
+        self.callee = None
+
+    def get(self):
+        """Returns the cached callee, or None if the name may resolve to something else now"""
+        table = self.table
+        if (
+            table is not None
+            and table.versions.get(self.name) is self.version
+            and self.name not in self.local_names
+        ):
+            return self.callee
+        return None
+
+    def fill(self, symbol_table: SymbolTable, callee):
+        """Caches callee as what the name resolves to from symbol_table"""
+        if self.name in self.local_names:
+            return
+        table = symbol_table
+        while table.parent is not None and not table.parent.frozen:
+            table = table.parent
+        self.table = table
+        self.version = table.version(self.name)
+        self.callee = callee
+
+
+class FramePool:
+    """
+    Contexts of finished procedure calls, each with its symbol table, kept so
+    later calls can reuse them instead of building new ones.
+
+    Only give back a context nothing refers to anymore. A call that failed
+    keeps its context, since the error's traceback walks it.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.free: list[Context] = []
+
+    def acquire(self, display_name, parent: Context, parent_entry_pos, slot_index=None):
+        """Returns a context for a call from parent, like a new Context with a new SymbolTable"""
+        try:
+            # Not checked first, since another thread could take the last one
+            context = self.free.pop()
+        except IndexError:
+            context = Context(display_name, parent, parent_entry_pos)
+            context.symbol_table = SymbolTable(parent.symbol_table, slot_index)
+            return context
+
+        context.display_name = display_name
+        context.parent = parent
+        context.parent_entry_pos = parent_entry_pos
+        context.tail_calls = 0
+        context.budget = parent.budget
+        symbol_table = context.symbol_table
+        symbol_table.parent = parent.symbol_table
+        symbol_table.slot_index = slot_index or {}
+        symbol_table.slots = [None] * len(symbol_table.slot_index)
+        return context
+
+    def release(self, context: Context):
+        if len(self.free) < self.size:
+            # Drops the references, so the pool doesn't keep the caller's values alive
+            context.parent = context.parent_entry_pos = context.budget = None
+            context.symbol_table.parent = None
+            context.symbol_table.symbols.clear()
+            context.symbol_table.slots = None
+            # New versions, so a CalleeCache that filled from this table doesn't
+            # stay valid for the frame that reuses it
+            if context.symbol_table.versions:
+                context.symbol_table.versions = {}
+            self.free.append(context)
@@ -4,6 +4,10 @@ from utils.context import Context
 from utils.utility_functions import string_with_arrows
 
 
+# Times a traceback line can repeat before the rest of the repeats are counted instead
+TRACEBACK_REPEATS = 3
+
+
 class Error:
     def __init__(self, pos_start: Position, pos_end, error_name, details):
         self.pos_start = pos_start
@@ -54,20 +58,40 @@ class RunTimeError(Error):
         return result
 
     def generate_traceback(self):
-        result = ""
+        lines = []
         pos = self.pos_start
         ctx: Context = self.context
 
         while ctx:
-            result = (
-                f"     File {pos.fn}, line {pos.ln + 1}, in {ctx.display_name}\n"
-                + result
-            )
+            lines.append(f"     File {pos.fn}, line {pos.ln + 1}, in {ctx.display_name}\n")
+            if ctx.tail_calls:
+                plural = "s" if ctx.tail_calls > 1 else ""
+                lines.append(f"     ({ctx.tail_calls} tail call{plural} elided)\n")
             pos = ctx.parent_entry_pos
             ctx = ctx.parent
+        lines.reverse()
+
+        # Deep recursion repeats the same line, which is shown a few times and then counted
+        result = ""
+        repeated = 0
+        for i, line in enumerate(lines):
+            if i > 0 and line == lines[i - 1]:
+                repeated += 1
+            else:
+                result += self.repeated_lines(repeated)
+                repeated = 0
+            if repeated < TRACEBACK_REPEATS:
+                result += line
+        result += self.repeated_lines(repeated)
 
         return "Traceback (most recent call last):\n" + result
 
+    def repeated_lines(self, repeated):
+        if repeated < TRACEBACK_REPEATS:
+            return ""
+        hidden = repeated - TRACEBACK_REPEATS + 1
+        return f"     [Previous line repeated {hidden} more time{'s' if hidden > 1 else ''}]\n"
+
 
 class GridError(Error):
     def __init__(self, pos_start=None, pos_end=None, details=""):
@@ -1,27 +1,69 @@
-class Position:
-    def __init__(self, idx, ln, col, fn, ftxt):
-        self.idx = idx
-        self.ln = ln
-        self.col = col
+from bisect import bisect_right
+
+
+class Source:
+    """A program's file name and text, shared by every Position in it"""
+
+    __slots__ = ("fn", "text", "line_starts")
+
+    def __init__(self, fn, text):
         self.fn = fn
-        self.ftxt = ftxt
+        self.text = text
+        self.line_starts = None  # offset of each line, found the first time a line is needed
 
-    def advance(self, current_char=None):
-        self.idx += 1
-        self.col += 1
+    def line(self, idx):
+        """Returns the line number of the character at offset idx, from 0"""
+        if self.line_starts is None:
+            line_starts = [0]
+            newline = self.text.find("\n")
+            while newline >= 0:
+                line_starts.append(newline + 1)
+                newline = self.text.find("\n", newline + 1)
+            self.line_starts = line_starts
+        return bisect_right(self.line_starts, idx) - 1
 
-        if current_char == "\n":
-            self.ln += 1
-            self.col = 0
 
-        return self
+class Position:
+    """
+    An offset into a Source. Positions never change once made, so nodes share
+    them. The line and column are only worked out when an error is shown.
+    """
+
+    __slots__ = ("idx", "source")
 
-    def revert(self, idx, col, ln):
+    def __init__(self, idx, source: Source):
         self.idx = idx
-        self.col = col
-        self.ln = ln
+        self.source = source
+
+    @property
+    def ln(self):
+        return self.source.line(self.idx)
+
+    @property
+    def col(self):
+        return self.idx - self.source.line_starts[self.ln]
+
+    @property
+    def fn(self):
+        return self.source.fn
+
+    @property
+    def ftxt(self):
+        return self.source.text
+
+
+class LineEndPosition(Position):
+    """The end of a newline character, counted as the column after it on the same line"""
+
+    __slots__ = ()
+
+    @property
+    def ln(self):
+        return self.source.line(self.idx - 1)
 
-        return self
 
-    def copy(self):
-        return Position(self.idx, self.ln, self.col, self.fn, self.ftxt)
+def end_position(idx, source: Source):
+    """Returns the Position of the end of a span that stops at offset idx"""
+    if idx > 0 and source.text.startswith("\n", idx - 1):
+        return LineEndPosition(idx, source)
+    return Position(idx, source)
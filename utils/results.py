@@ -1,13 +1,12 @@
-from utils.errors import EndOfFile
-
-
 class ParseResult:
     def __init__(self):
         self.error = None
         self.node = None
         self.last_registered_advance_count = 0
         self.advance_count = 0
-        self.to_reverse_count = 0
+        # A token the parser has gone past that the statements around this one
+        # end at, as if it had stopped there
+        self.stop_token = None
 
     def register_advancement(self):
         self.last_registered_advance_count = 1
@@ -20,18 +19,6 @@ class ParseResult:
             self.error = result.error
         return result.node
 
-    def try_register(self, result):
-        if result.error:
-            self.to_reverse_count = result.advance_count
-            return None
-        return self.register(result)
-
-    def try_eof_register(self, result):
-        if result.error and isinstance(result.error, EndOfFile):
-            self.to_reverse_count = result.advance_count
-            return None
-        return self.register(result)
-
     def success(self, node):
         self.node = node
         return self
@@ -43,6 +30,15 @@ class ParseResult:
 
 
 class RunTimeResult:
+    __slots__ = (
+        "value",
+        "error",
+        "func_return_value",
+        "loop_should_continue",
+        "loop_should_break",
+        "tail_call",
+    )
+
     def __init__(self):
         self.reset()
 
@@ -52,6 +48,7 @@ class RunTimeResult:
         self.func_return_value = None
         self.loop_should_continue = False
         self.loop_should_break = False
+        self.tail_call = None
 
     def register(self, result):
         if isinstance(result, RunTimeResult):
@@ -59,6 +56,7 @@ class RunTimeResult:
             self.func_return_value = result.func_return_value
             self.loop_should_continue = result.loop_should_continue
             self.loop_should_break = result.loop_should_break
+            self.tail_call = result.tail_call
             return result.value
         return result
 
@@ -82,6 +80,12 @@ class RunTimeResult:
         self.loop_should_break = True
         return self
 
+    def success_tail_call(self, function, args):
+        """The body ended with RETURN function(args), left for Function.execute to run"""
+        self.reset()
+        self.tail_call = (function, args)
+        return self
+
     def failure(self, error):
         self.reset()
         self.error = error
@@ -93,4 +97,64 @@ class RunTimeResult:
             or self.func_return_value
             or self.loop_should_continue
             or self.loop_should_break
+            or self.tail_call
         )
+
+    def raise_signal(self):
+        """Re-raises whatever this result is carrying as a control flow signal"""
+        if self.error:
+            raise ErrorSignal(self.error)
+        if self.func_return_value:
+            raise ReturnSignal(self.func_return_value)
+        if self.loop_should_continue:
+            raise ContinueSignal()
+        if self.loop_should_break:
+            raise BreakSignal()
+        if self.tail_call:
+            raise TailCallSignal(*self.tail_call)
+
+    @staticmethod
+    def capture(code, *args):
+        """Calls code, turning its value or the signal it raised into a RunTimeResult"""
+        try:
+            return RunTimeResult().success(code(*args))
+        except ReturnSignal as signal:
+            return RunTimeResult().success_return(signal.value)
+        except ContinueSignal:
+            return RunTimeResult().success_continue()
+        except BreakSignal:
+            return RunTimeResult().success_break()
+        except TailCallSignal as signal:
+            return RunTimeResult().success_tail_call(signal.function, signal.args)
+        except ErrorSignal as signal:
+            return RunTimeResult().failure(signal.error)
+
+
+class ReturnSignal(Exception):
+    """Raised by RETURN to unwind to the enclosing procedure call."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class TailCallSignal(Exception):
+    """Raised by a RETURN f(...) that the Resolver found can run f in place of its procedure."""
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+
+class BreakSignal(Exception):
+    """Raised by BREAK to leave the innermost loop."""
+
+
+class ContinueSignal(Exception):
+    """Raised by CONTINUE to skip to the next iteration of the innermost loop."""
+
+
+class ErrorSignal(Exception):
+    """Carries a RunTimeError out of the node that raised it."""
+
+    def __init__(self, error):
+        self.error = error
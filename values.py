@@ -1,12 +1,24 @@
+from itertools import islice
+
 from utils.position import Position
 from utils.errors import RunTimeError
 from utils.results import RunTimeResult
 
 
 class Value:
-    def __init__(self):
-        self.set_pos()
-        self.set_context()
+    """
+    Numbers, Booleans and Strings never change once made, so a variable read or
+    a procedure's return value hands out the stored object itself. Where a value
+    was written and the context it belongs to are tracked by the engines instead
+    of on every value: pos_start, pos_end and context are only set on the copy
+    that located() makes when an operation fails and the error needs them.
+    That also lets TRUE, FALSE and small integers be single shared objects,
+    from Boolean.of and Number.of.
+    """
+
+    pos_start = None
+    pos_end = None
+    context = None
 
     def set_pos(self, pos_start: Position = None, pos_end: Position = None):
         self.pos_start = pos_start
@@ -62,12 +74,18 @@ class Value:
     def notted(self):
         return None, self.illegal_operation()
 
-    def execute(self):
-        return RunTimeResult().failure(self.illegal_operation())
+    def execute(self, args, context, pos_start, pos_end):
+        return RunTimeResult().failure(
+            self.located(pos_start, pos_end, context).illegal_operation()
+        )
 
     def copy(self):
         raise Exception("No copy method defined")
 
+    def located(self, pos_start, pos_end, context):
+        """Returns a copy placed at pos_start..pos_end in context, for error reporting"""
+        return self.copy().set_pos(pos_start, pos_end).set_context(context)
+
     def is_true(self):
         return False
 
@@ -84,21 +102,30 @@ class Number(Value):
         super().__init__()
         self.value = value
 
+    @staticmethod
+    def of(value):
+        """Returns a Number of value, the shared one if value is a small integer"""
+        if type(value) is int:
+            number = SMALL_INTS.get(value)
+            if number is not None:
+                return number
+        return Number(value)
+
     def added_to(self, other):
         if isinstance(other, Number):
-            return Number(self.value + other.value).set_context(self.context), None
+            return Number.of(self.value + other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def subract_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value - other.value).set_context(self.context), None
+            return Number.of(self.value - other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiply_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value * other.value).set_context(self.context), None
+            return Number.of(self.value * other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -108,7 +135,7 @@ class Number(Value):
                 return None, RunTimeError(
                     other.pos_start, other.pos_end, "Division by zero", self.context
                 )
-            return Number(self.value / other.value).set_context(self.context), None
+            return Number.of(self.value / other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -118,49 +145,49 @@ class Number(Value):
                 return None, RunTimeError(
                     other.pos_start, other.pos_end, "Division by zero", self.context
                 )
-            return Number(self.value % other.value).set_context(self.context), None
+            return Number.of(self.value % other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def power_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value**other.value).set_context(self.context), None
+            return Number.of(self.value**other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_eq(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value == other.value).set_context(self.context), None
+            return Boolean.of(self.value == other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_ne(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value != other.value).set_context(self.context), None
+            return Boolean.of(self.value != other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_lt(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value < other.value).set_context(self.context), None
+            return Boolean.of(self.value < other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_gt(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value > other.value).set_context(self.context), None
+            return Boolean.of(self.value > other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_lte(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value <= other.value).set_context(self.context), None
+            return Boolean.of(self.value <= other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_gte(self, other):
         if isinstance(other, Number):
-            return Boolean(self.value >= other.value).set_context(self.context), None
+            return Boolean.of(self.value >= other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -179,33 +206,47 @@ class Number(Value):
 
 Number.null = Number(0)
 
+# The shared Number of each small integer, handed out by Number.of
+SMALL_INTS = {}
+
+
+def intern_small_ints(first=-5, last=256):
+    """Makes Number.of share one Number for each integer from first to last"""
+    SMALL_INTS.clear()
+    for value in range(first, last + 1):
+        SMALL_INTS[value] = Number.null if value == 0 else Number(value)
+
+
+intern_small_ints()
+
 
 class Boolean(Value):
     def __init__(self, value):
         super().__init__()
         self.value: bool = value
 
+    @staticmethod
+    def of(value):
+        """Returns the shared TRUE or FALSE, unless share_booleans turned it off"""
+        if SHARE_BOOLEANS:
+            return Boolean.true if value else Boolean.false
+        return Boolean(bool(value))
+
     def added_to(self, other):
         if isinstance(other, Boolean):
-            return Number(int(self.value) + int(other.value)).set_context(
-                self.context
-            ), None
+            return Number.of(int(self.value) + int(other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def subract_by(self, other):
         if isinstance(other, Boolean):
-            return Number(int(self.value) - int(other.value)).set_context(
-                self.context
-            ), None
+            return Number.of(int(self.value) - int(other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiply_by(self, other):
         if isinstance(other, Boolean):
-            return Number(int(self.value) * int(other.value)).set_context(
-                self.context
-            ), None
+            return Number.of(int(self.value) * int(other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -215,38 +256,36 @@ class Boolean(Value):
                 return None, RunTimeError(
                     other.pos_start, other.pos_end, "Division by zero", self.context
                 )
-            return Number(int(self.value) / int(other.value)).set_context(
-                self.context
-            ), None
+            return Number.of(int(self.value) / int(other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_eq(self, other):
         if isinstance(other, Boolean):
-            return Boolean(self.value == other.value).set_context(self.context), None
+            return Boolean.of(self.value == other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comparison_ne(self, other):
         if isinstance(other, Boolean):
-            return Boolean(self.value != other.value).set_context(self.context), None
+            return Boolean.of(self.value != other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def and_by(self, other):
         if isinstance(other, Boolean):
-            return Boolean(self.value and other.value).set_context(self.context), None
+            return Boolean.of(self.value and other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def or_by(self, other):
         if isinstance(other, Boolean):
-            return Boolean(self.value or other.value).set_context(self.context), None
+            return Boolean.of(self.value or other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def notted(self):
-        return Boolean(not self.value).set_context(self.context), None
+        return Boolean.of(not self.value), None
 
     def copy(self):
         copy = Boolean(self.value)
@@ -261,6 +300,19 @@ class Boolean(Value):
         return str(self.value)
 
 
+Boolean.true = Boolean(True)
+Boolean.false = Boolean(False)
+
+# Whether Boolean.of hands out Boolean.true and Boolean.false
+SHARE_BOOLEANS = True
+
+
+def share_booleans(shared=True):
+    """Makes Boolean.of share TRUE and FALSE, or make a new Boolean every time"""
+    global SHARE_BOOLEANS
+    SHARE_BOOLEANS = shared
+
+
 class String(Value):
     def __init__(self, value):
         super().__init__()
@@ -268,13 +320,13 @@ class String(Value):
 
     def added_to(self, other):
         if isinstance(other, String):
-            return String(self.value + other.value).set_context(self.context), None
+            return String(self.value + other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiply_by(self, other):
         if isinstance(other, Number):
-            return String(self.value * other.value).set_context(self.context), None
+            return String(self.value * other.value), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -295,21 +347,83 @@ class String(Value):
 
 
 class List(Value):
-    def __init__(self, elements: list):
+    """
+    Lists share their storage. A List is the first size items of a Python list
+    that other Lists may also be looking at, so + and * only copy when they have
+    to: a List whose items end where the storage ends can grow the storage in
+    place, because every other List using it only sees a shorter prefix. That
+    makes building a list with list = list + x amortized O(1), and the List
+    you started from keeps its items.
+
+    APPEND, INSERT and REMOVE change the List itself. Before changing items
+    another List might see, it takes a private copy of its storage.
+
+    A FOR loop goes over the items the list had when the loop started, like a
+    List sharing its storage: APPEND, INSERT and REMOVE on the list inside the
+    loop change the list, but not what the loop visits.
+    """
+
+    def __init__(self, elements: list, size=None):
         super().__init__()
-        self.elements: list = elements
+        self.storage: list = elements
+        self.size = len(elements) if size is None else size
+        # Whether another List may be using storage
+        self.shared = False
+
+    @property
+    def elements(self) -> list:
+        """The items of the list. Don't change it, use append, insert and pop."""
+        if self.size == len(self.storage):
+            return self.storage
+        return self.storage[: self.size]
+
+    def iterate(self):
+        """Iterates over the items the list has now, whatever happens to it later"""
+        # The iterator looks at the storage, so changing it in place has to copy
+        self.shared = True
+        return islice(self.storage, self.size)
+
+    def own(self):
+        """Gives the list storage no other List uses, so it can be changed in place"""
+        if self.shared or self.size != len(self.storage):
+            self.storage = self.storage[: self.size]
+            self.shared = False
+
+    def extended(self, items):
+        """Returns a new List with items after this list's items"""
+        if self.size == len(self.storage):
+            self.storage.extend(items)
+            new_list = List(self.storage, len(self.storage))
+            self.shared = new_list.shared = True
+            return new_list
+        return List(self.storage[: self.size] + items)
+
+    def append(self, value):
+        if self.size != len(self.storage):
+            self.own()
+        self.storage.append(value)
+        self.size += 1
+
+    def insert(self, index, value):
+        self.own()
+        self.storage.insert(index, value)
+        self.size = len(self.storage)
+
+    def pop(self, index):
+        self.own()
+        value = self.storage.pop(index)
+        self.size = len(self.storage)
+        return value
 
     def added_to(self, other):
         """Appends a value to the list."""
-        new_list = self.copy()
-        new_list.elements.append(other)
-        return new_list, None
+        return self.extended([other]), None
 
     def subract_by(self, other):
         if isinstance(other, Number):
-            new_list = self.copy()
+            new_list = List(self.storage[: self.size])
             try:
-                new_list.elements.pop(other.value)
+                new_list.pop(other.value)
                 return new_list, None
             except:
                 return None, RunTimeError(
@@ -324,16 +438,16 @@ class List(Value):
     def multiply_by(self, other):
         """Concatenates another list to this."""
         if isinstance(other, List):
-            new_list = self.copy()
-            new_list.elements.extend(other.elements)
-            return new_list, None
+            return self.extended(other.storage[: other.size]), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def divide_by(self, other):
         if isinstance(other, Number):
             try:
-                return self.elements[other.value], None
+                if not -self.size <= other.value < self.size:
+                    raise IndexError(other.value)
+                return self.storage[other.value % self.size], None
             except:
                 return None, RunTimeError(
                     other.pos_start,
@@ -345,7 +459,8 @@ class List(Value):
             return None, Value.illegal_operation(self, other)
 
     def copy(self):
-        copy = List(self.elements)
+        copy = List(self.storage, self.size)
+        self.shared = copy.shared = True
         copy.set_pos(self.pos_start, self.pos_end)
         copy.set_context(self.context)
         return copy